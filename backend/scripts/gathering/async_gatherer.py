@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+
+import aiohttp
+
+from .checkpoint import CheckpointWriter, compact_checkpoint, pending_commanders, read_checkpoint
+from .edhrec_extract import extract_commander_data, sanitize_commander_name
+from .http_cache import DEFAULT_MAX_BYTES, ResponseCache
+from .refresh_planner import (load_snapshot, plan_refresh, print_plan, read_commander_rows, save_snapshot,
+                              update_snapshot)
+from .response_pack import ResponsePackWriter
+
+# Get the path to the scripts directory (parent of gathering)
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EDHREC_JSON_URL = 'https://json.edhrec.com/pages'
+
+# Statuses worth retrying; anything else (e.g. 404 for an unknown commander) fails right away
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Longest wait between attempts, whatever Retry-After or the backoff asks for
+MAX_RETRY_DELAY = 60.0
+
+
+class FetchError(Exception):
+    """A request that failed for good (non-retryable status or out of retries)."""
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` requests per second on average, with
+    bursts of up to `capacity` requests after an idle stretch.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class EdhrecClient:
+    """
+    Async JSON client for EDHREC with a concurrency limit, a token-bucket
+    rate limit, per-request timeouts and retries with jittered exponential
+    backoff (Retry-After is honored on 429/503). Waits between attempts are
+    capped at max_retry_delay seconds.
+
+    base_url defaults to EDHREC's JSON pages; point it at a local server to
+    replay recorded pages.
+
+    With a ResponseCache, requests for cached pages are conditional and a 304
+    reuses the cached body; not_modified counts those, downloaded the rest.
+    """
+
+    def __init__(self, base_url=EDHREC_JSON_URL, concurrency=8, rate=4.0, burst=None,
+                 retries=4, timeout=30, backoff=1.0, max_retry_delay=MAX_RETRY_DELAY, cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_delay = max_retry_delay
+        self.cache = cache
+        self.not_modified = 0
+        self.downloaded = 0
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = TokenBucket(rate, burst)
+        self._session = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            timeout=self._timeout,
+            headers={'User-Agent': 'commander-viz-gatherer', 'Accept': 'application/json'}
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    def commander_url(self, commander):
+        return f"{self.base_url}/commanders/{sanitize_commander_name(commander)}.json"
+
+    def _retry_delay(self, attempt, retry_after=None):
+        delay = None
+        if retry_after is not None:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                pass
+        if delay is None:
+            # Full jitter around the exponential step, so retries from many tasks spread out
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        # A bogus Retry-After (or a long run of retries) mustn't stall a worker indefinitely
+        return min(max(delay, 0.0), self.max_retry_delay)
+
+    async def _request(self, url, headers=None):
+        """One attempt. Returns (status, headers, body)."""
+        async with self._semaphore:
+            async with self._session.get(url, headers=headers) as response:
+                return response.status, response.headers, await response.read()
+
+    async def get_body(self, url):
+        """
+        Response body for a URL, revalidated against the cache when there is
+        one. Returns (body, modified); modified is False when the server
+        answered 304 and the body came from the cache.
+        """
+        last_error = None
+        for attempt in range(self.retries + 1):
+            await self._limiter.acquire()
+            retry_after = None
+            try:
+                conditional = self.cache.conditional_headers(url) if self.cache else {}
+                status, headers, body = await self._request(url, conditional)
+                if status == 304 and conditional:
+                    cached = self.cache.get_body(url)
+                    if cached is not None:
+                        self.not_modified += 1
+                        return cached, False
+                    # The body was evicted after the headers were built; fetch it again unconditionally
+                    await self._limiter.acquire()
+                    status, headers, body = await self._request(url)
+                if status == 200:
+                    self.downloaded += 1
+                    if self.cache:
+                        self.cache.put(url, body, headers)
+                    return body, True
+                if status not in RETRY_STATUSES:
+                    raise FetchError(f"{url}: HTTP {status}")
+                retry_after = headers.get('Retry-After')
+                last_error = f"HTTP {status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+            if attempt < self.retries:
+                await asyncio.sleep(self._retry_delay(attempt, retry_after))
+        raise FetchError(f"{url}: gave up after {self.retries + 1} attempts ({last_error})")
+
+    async def get_json(self, url):
+        body, _ = await self.get_body(url)
+        try:
+            return json.loads(body)
+        except json.JSONDecodeError as e:
+            raise FetchError(f"{url}: invalid JSON ({e})")
+
+    async def get_commander_page(self, commander):
+        return await self.get_json(self.commander_url(commander))
+
+
+async def gather_commanders(commanders, client, previous=None, checkpoint=None, pack=None):
+    """
+    Fetch and extract every commander concurrently through `client`.
+    Returns {commander: data} in input order, with None for commanders that
+    failed, like the notebook gatherer.
+
+    previous holds the results of the last run; a commander whose page comes
+    back 304 reuses its previous entry instead of re-parsing the cached page.
+    With a CheckpointWriter, each result is appended to it as soon as it's in.
+    With a ResponsePackWriter, new raw pages (and any the pack is missing) are
+    archived for offline re-extraction.
+    """
+    previous = previous or {}
+    results = {}
+    done = 0
+
+    async def gather_one(commander):
+        nonlocal done
+        url = client.commander_url(commander)
+        data = error = None
+        try:
+            body, modified = await client.get_body(url)
+            if not modified and previous.get(commander):
+                data = previous[commander]
+            else:
+                data = extract_commander_data(commander, json.loads(body))
+            if pack is not None and (modified or commander not in pack):
+                pack.append(commander, body)
+        except json.JSONDecodeError as e:
+            error = f"{url}: invalid JSON ({e})"
+            if client.cache:
+                client.cache.discard(url)
+        except FetchError as e:
+            error = str(e)
+        except Exception as e:
+            # Anything else (a malformed page, the pack or cache failing) only
+            # fails this commander instead of the whole gather
+            error = f"{url}: {type(e).__name__}: {e}"
+        if error:
+            # Recorded as a failure even if the page was extracted, so a resumed run fetches it again
+            data = None
+            print(f"Error processing {commander}: {error}")
+        if checkpoint:
+            checkpoint.write(commander, data, error)
+        done += 1
+        print(f"Processed {commander} ({done}/{len(commanders)})")
+        return commander, data
+
+    for commander, data in await asyncio.gather(*(gather_one(c) for c in commanders)):
+        results[commander] = data
+    return results
+
+
+def read_commander_names(csv_path, limit=None):
+    """Commander names from the EDHREC commanders CSV (Rank, Commander, Deck_Count), in rank order."""
+    return [row['commander'] for row in read_commander_rows(csv_path, limit)]
+
+
+async def gather_commander_data(commanders, previous=None, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                                checkpoint=None, pack=None, **client_options):
+    cache = ResponseCache(cache_dir, cache_max_bytes) if cache_dir else None
+    try:
+        async with EdhrecClient(cache=cache, **client_options) as client:
+            results = await gather_commanders(commanders, client, previous, checkpoint, pack)
+        if cache:
+            print(f"{client.not_modified} pages unchanged, {client.downloaded} downloaded "
+                  f"(cache holds {cache.total_bytes() / 1e6:.1f} MB)")
+        return results
+    finally:
+        if cache:
+            cache.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gather EDHREC commander pages concurrently")
+    parser.add_argument('--csv', default='edhrec_commanders_complete.csv',
+                        help="Commander list CSV, relative to the scripts directory")
+    parser.add_argument('--limit', type=int, default=200, help="Number of top commanders to gather (default: 200)")
+    parser.add_argument('--out', default='../data/extracted_commander_data.json',
+                        help="Output file, relative to the scripts directory")
+    parser.add_argument('--base-url', default=EDHREC_JSON_URL,
+                        help="Base URL of the JSON pages (point at a local server to replay recorded pages)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight at once (default: 8)")
+    parser.add_argument('--rate', type=float, default=4.0, help="Average requests per second (default: 4)")
+    parser.add_argument('--burst', type=float, help="Token bucket size (default: max(1, rate))")
+    parser.add_argument('--retries', type=int, default=4, help="Retries per request (default: 4)")
+    parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds (default: 30)")
+    parser.add_argument('--max-retry-delay', type=float, default=MAX_RETRY_DELAY,
+                        help=f"Longest wait between attempts, including Retry-After (default: {MAX_RETRY_DELAY:g})")
+    parser.add_argument('--cache-dir', default='.http_cache',
+                        help="Response cache for conditional requests, relative to the scripts directory")
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / 2**20,
+                        help="Response cache size limit in MB; least recently used pages are evicted (default: 512)")
+    parser.add_argument('--no-cache', action='store_true', help="Fetch every page unconditionally")
+    parser.add_argument('--checkpoint', default='../data/gather_checkpoint.ndjson',
+                        help="Append-only per-commander results of the current run, relative to the scripts directory")
+    parser.add_argument('--restart', action='store_true',
+                        help="Discard an existing checkpoint instead of resuming from it")
+    parser.add_argument('--pack', default='../data/edhrec_pages.pack',
+                        help="Archive of raw pages for offline re-extraction, relative to the scripts directory")
+    parser.add_argument('--no-pack', action='store_true', help="Don't archive raw pages")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Only refetch commanders that are new or changed since the snapshot, plus a rotation "
+                             "of the longest-unfetched ones; everyone else keeps their current data")
+    parser.add_argument('--snapshot', default='../data/refresh_snapshot.json',
+                        help="Rank/Deck_Count of each commander at its last fetch, relative to the scripts directory")
+    parser.add_argument('--rank-threshold', type=int, default=10,
+                        help="refresh: refetch commanders that moved more than this many ranks (default: 10)")
+    parser.add_argument('--deck-change', type=float, default=0.1,
+                        help="refresh: refetch commanders whose deck count changed by more than this fraction "
+                             "(default: 0.1)")
+    parser.add_argument('--rotation', type=int, default=10,
+                        help="refresh: also refetch this many of the longest-unfetched commanders (default: 10)")
+    args = parser.parse_args(argv)
+
+    rows = read_commander_rows(os.path.join(SCRIPTS_DIR, args.csv), args.limit)
+    commanders = [row['commander'] for row in rows]
+    output_path = os.path.join(SCRIPTS_DIR, args.out)
+    checkpoint_path = os.path.join(SCRIPTS_DIR, args.checkpoint)
+    snapshot_path = os.path.join(SCRIPTS_DIR, args.snapshot)
+
+    # Last run's results: unchanged pages reuse their entries, and a refresh
+    # keeps them for everyone it doesn't refetch
+    previous = None
+    if os.path.exists(output_path):
+        with open(output_path) as f:
+            previous = json.load(f)
+
+    snapshot = load_snapshot(snapshot_path)
+    targets = commanders
+    if args.refresh:
+        plan = plan_refresh(rows, snapshot, args.rank_threshold, args.deck_change, args.rotation,
+                            available=previous or {})
+        print_plan(plan, len(rows))
+        targets = list(plan)
+
+    # Resume an interrupted run: commanders already in the checkpoint are kept,
+    # only missing ones and earlier failures are fetched
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    pending = pending_commanders(targets, read_checkpoint(checkpoint_path))
+    if len(pending) < len(targets):
+        print(f"Resuming from {args.checkpoint}: {len(targets) - len(pending)} commanders done, "
+              f"{len(pending)} to go")
+
+    print(f"Gathering {len(pending)} commanders from {args.base_url}...")
+    pack = None if args.no_pack else ResponsePackWriter(os.path.join(SCRIPTS_DIR, args.pack))
+    with CheckpointWriter(checkpoint_path) as checkpoint:
+        asyncio.run(gather_commander_data(
+            pending, previous=None if args.no_cache else previous, checkpoint=checkpoint, pack=pack,
+            cache_dir=None if args.no_cache else os.path.join(SCRIPTS_DIR, args.cache_dir),
+            cache_max_bytes=int(args.cache_size * 2**20),
+            base_url=args.base_url, concurrency=args.concurrency, rate=args.rate,
+            burst=args.burst, retries=args.retries, timeout=args.timeout, max_retry_delay=args.max_retry_delay
+        ))
+    if pack:
+        pack.close()
+
+    print("\nCompacting checkpoint into final results...")
+    results = compact_checkpoint(checkpoint_path, commanders, output_path,
+                                 base=previous if args.refresh else None)
+    checkpointed = read_checkpoint(checkpoint_path)
+    save_snapshot(update_snapshot(snapshot, rows, [c for c in targets if checkpointed.get(c)]), snapshot_path)
+    failed = pending_commanders(targets, checkpointed)
+    print(f"Data exported to: {output_path} ({len(results) - len(failed)} commanders, {len(failed)} failed)")
+    if failed:
+        print(f"Run again to retry the failed commanders (checkpoint kept at {args.checkpoint})")
+    else:
+        # The run is complete; the next one starts from scratch
+        os.remove(checkpoint_path)
+
+if __name__ == "__main__":
+    main()
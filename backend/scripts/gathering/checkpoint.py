@@ -0,0 +1,83 @@
+import json
+import os
+
+
+class CheckpointWriter:
+    """
+    Append-only NDJSON checkpoint of a gather run: one
+    {"commander": ..., "data": ...} record per line, flushed and fsynced as
+    each result arrives, so a crash loses at most the commander in flight.
+    Failures are recorded with data null and an error message.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        # Start on a fresh line if the last run died mid-record
+        if self._file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._file.write('\n')
+
+    def write(self, commander, data, error=None):
+        record = {'commander': commander, 'data': data}
+        if error is not None:
+            record['error'] = error
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_checkpoint(path):
+    """
+    {commander: data} from a checkpoint, later records winning (a retried
+    failure overrides the earlier null). A torn last line from a crash
+    mid-write is skipped.
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[record['commander']] = record['data']
+    return results
+
+
+def pending_commanders(commanders, checkpointed):
+    """Commanders with no successful result in the checkpoint yet, in input order."""
+    return [commander for commander in commanders if not checkpointed.get(commander)]
+
+
+def compact_checkpoint(path, commanders, output_path, base=None):
+    """
+    Fold a checkpoint into the single {commander: data} JSON file that
+    load_commander_data reads, in commander (rank) order with None for
+    commanders that never succeeded. Commanders without a successful record
+    fall back to their entry in base (the previous results) when given.
+    The file is written to a temporary path and moved into place. Returns the
+    compacted results.
+    """
+    checkpointed = read_checkpoint(path)
+    base = base or {}
+    results = {commander: checkpointed.get(commander) or base.get(commander) for commander in commanders}
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, output_path)
+    return results
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import csv
+import os
+
+from .async_gatherer import EDHREC_JSON_URL, SCRIPTS_DIR, EdhrecClient
+
+# First page of EDHREC's commander listing; later pages are linked from each page's "more"
+DEFAULT_LISTING = 'commanders/year.json'
+
+CSV_COLUMNS = ['Rank', 'Commander', 'Deck_Count']
+
+
+def listing_page_entries(page):
+    """
+    (cardviews, more) from one listing page. The first page nests its lists
+    under container.json_dict.cardlists like a commander page; the pages
+    behind "more" carry cardviews and more at the top level.
+    """
+    if 'container' in page:
+        cardlists = page['container'].get('json_dict', {}).get('cardlists', [])
+        cardviews = [cardview for cardlist in cardlists for cardview in cardlist.get('cardviews', [])]
+        more = next((cardlist['more'] for cardlist in cardlists if cardlist.get('more')), None)
+    else:
+        cardviews = page.get('cardviews', [])
+        more = page.get('more')
+    return cardviews, more
+
+
+def cardview_deck_count(cardview):
+    """
+    num_decks, or parsed from a "35,568 decks" label when a page only has the
+    label. Raises ValueError when there's neither: the listing's format has
+    changed, and a CSV full of zero deck counts would pass for real data.
+    """
+    if cardview.get('num_decks') is not None:
+        return int(cardview['num_decks'])
+    label = cardview.get('label') or ''
+    count = label.split(' ')[0].replace(',', '')
+    if not count.isdigit():
+        raise ValueError(f"No deck count for {cardview.get('name')!r}: no num_decks and label {label!r}")
+    return int(count)
+
+
+async def iter_commander_index(client, listing=DEFAULT_LISTING, limit=None):
+    """
+    Yield (rank, commander, deck_count) in listing order, following each
+    page's "more" link until the listing ends (or limit commanders are out).
+    Ranks are positions in the listing, like the scraped page's labels.
+    A "more" link back to a page that was already fetched ends the listing.
+    """
+    url = f"{client.base_url}/{listing}"
+    seen = set()
+    visited = set()
+    rank = 0
+    while url:
+        if url in visited:
+            print(f"Listing links back to {url}, stopping")
+            return
+        visited.add(url)
+        cardviews, more = listing_page_entries(await client.get_json(url))
+        for cardview in cardviews:
+            name = cardview.get('name')
+            # The listing can shift while it's paged through; keep a commander's first appearance
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            rank += 1
+            yield rank, name, cardview_deck_count(cardview)
+            if limit and rank >= limit:
+                return
+        url = f"{client.base_url}/{more.lstrip('/')}" if more else None
+
+
+async def write_commander_index(output_path, listing=DEFAULT_LISTING, limit=None, **client_options):
+    """
+    Stream the commander listing into a Rank,Commander,Deck_Count CSV in the
+    format edhrec_commanders_complete.csv has always had (Deck_Count with
+    thousands separators). Rows are written as pages arrive, to a temporary
+    file that replaces output_path once the listing is complete, so a
+    listing that fails partway (e.g. a page without deck counts) leaves the
+    previous CSV in place.
+    Returns the number of commanders written.
+    """
+    tmp_path = output_path + '.tmp'
+    count = 0
+    try:
+        async with EdhrecClient(**client_options) as client:
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(CSV_COLUMNS)
+                async for rank, name, deck_count in iter_commander_index(client, listing, limit):
+                    writer.writerow([rank, name, f"{deck_count:,}"])
+                    count += 1
+                    if count % 500 == 0:
+                        print(f"Fetched {count} commanders...")
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch the EDHREC commander list into edhrec_commanders_complete.csv")
+    parser.add_argument('--out', default='edhrec_commanders_complete.csv',
+                        help="Output CSV, relative to the scripts directory")
+    parser.add_argument('--listing', default=DEFAULT_LISTING,
+                        help=f"Path of the first listing page under the base URL (default: {DEFAULT_LISTING})")
+    parser.add_argument('--limit', type=int, help="Stop after this many commanders (default: the whole listing)")
+    parser.add_argument('--base-url', default=EDHREC_JSON_URL,
+                        help="Base URL of the JSON pages (point at a local server to replay recorded pages)")
+    parser.add_argument('--rate', type=float, default=4.0, help="Average requests per second (default: 4)")
+    parser.add_argument('--retries', type=int, default=4, help="Retries per request (default: 4)")
+    parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds (default: 30)")
+    args = parser.parse_args(argv)
+
+    output_path = os.path.join(SCRIPTS_DIR, args.out)
+    print(f"Fetching commander list from {args.base_url}/{args.listing}...")
+    count = asyncio.run(write_commander_index(
+        output_path, args.listing, args.limit,
+        base_url=args.base_url, rate=args.rate, retries=args.retries, timeout=args.timeout
+    ))
+    print(f"Commander list exported to: {output_path} ({count} commanders)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Extraction helpers for EDHREC commander pages, ported from the data-gathering
+# notebook so every gatherer writes the same extracted_commander_data.json format
+
+def extract_commander_data(commander_name, raw_data):
+    """Extract all relevant commander data using the mapped structure"""
+    try:
+        # Get the container and json_dict paths which contain most of our data
+        container = raw_data.get('container', {})
+        json_dict = container.get('json_dict', {})
+        card = json_dict.get('card', {})
+        
+        # Get card lists (groups of cards)
+        cardlists = json_dict.get('cardlists', [])
+        card_groups = {}
+        for cardlist in cardlists:
+            header = cardlist.get('header')
+            if header:  # Only process if header exists
+                cards = cardlist.get('cardviews', [])
+                card_groups[header] = [
+                    {
+                        'name': c.get('name'),
+                        'sanitized': c.get('sanitized'), 
+                        'synergy': c.get('synergy'),
+                        'inclusion': c.get('inclusion'),
+                        'num_decks': c.get('num_decks')
+                    } for c in cards
+                ]
+
+        # Extract deck count and rank from label
+        label = card.get('label', '')
+        deck_count = None
+        rank = None
+        if label:
+            # Parse "28041 decks (0.554%)\nRank #2"
+            try:
+                deck_count = int(label.split(' ')[0])
+                rank = int(label.split('#')[1])
+            except (ValueError, IndexError):
+                pass
+
+        # Get tribes from panels/tribelinks
+        tribes = []
+        if 'panels' in raw_data:
+            tribelinks = raw_data['panels'].get('tribelinks', [])
+            tribes = [
+                {
+                    'name': tribe.get('value'),
+                    'count': tribe.get('count')
+                } for tribe in tribelinks
+            ]
+
+        return {
+            "name": commander_name,
+            "sanitized": card.get('sanitized'),
+            "color_identity": card.get('color_identity', []),
+            "tcgplayer_price": card.get('prices', {}).get('tcgplayer', {}).get('price'),
+            "deck_count": deck_count,
+            "rank": rank,
+            "salt_score": card.get('salt'),
+            "tribes": tribes,
+            "card_groups": card_groups
+        }
+    except Exception as e:
+        print(f"Error processing {commander_name}: {str(e)}")
+        return None
+
+def sanitize_commander_name(name):
+    """Sanitize commander name to match EDHREC's format"""
+    # Convert to lowercase
+    sanitized = name.lower()
+    
+    # Handle partner commanders (replace '//' with a dash)
+    if '//' in sanitized:
+        parts = sanitized.split('//')
+        # Clean each part and join with a dash
+        parts = [part.strip() for part in parts]
+        sanitized = '-'.join(parts)
+    
+    # Replace special characters
+    replacements = {
+        # Special characters
+        'û': 'u',
+        'ñ': 'n',
+        'é': 'e',
+        # Punctuation
+        ',': '',
+        "'": '',
+        '.': '',
+        '&': 'and',
+        '"': '',  # Remove quotes
+        # Spaces
+        ' ': '-',
+    }
+    
+    for old, new in replacements.items():
+        sanitized = sanitized.replace(old, new)
+    
+    return sanitized
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    On-disk cache of HTTP response bodies with their validators, for
+    conditional requests.
+
+    Bodies live in <cache_dir>/bodies/ named by a hash of the URL; an SQLite
+    table tracks each URL's ETag, Last-Modified, body size and last use.
+    Only responses with a validator are stored, since anything else can't be
+    revalidated. When the total body size goes over max_bytes the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, 'bodies'), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'))
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER,
+                last_used REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        # The limit may have been lowered since the last run
+        self._evict()
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def _body_path(self, url):
+        return os.path.join(self.cache_dir, 'bodies', hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since for a cached URL, or {} if it isn't cached."""
+        row = self._conn.execute("SELECT etag, last_modified FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(self._body_path(url)):
+            return {}
+        etag, last_modified = row
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def get_body(self, url):
+        """
+        The cached body for a URL (after a 304), marking it as recently used.
+        Returns None, and drops the entry, if the body is gone (e.g. evicted
+        since conditional_headers was called).
+        """
+        try:
+            with open(self._body_path(url), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.discard(url)
+            return None
+        self._conn.execute("UPDATE entries SET last_used = ? WHERE url = ?", (time.time(), url))
+        self._conn.commit()
+        return body
+
+    def put(self, url, body, headers):
+        """Store a 200 response if it carries an ETag or Last-Modified."""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        path = self._body_path(url)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (url, etag, last_modified, len(body), time.time())
+        )
+        self._evict()
+        self._conn.commit()
+
+    def discard(self, url):
+        """Drop a URL's entry, e.g. when its cached body turned out to be unusable."""
+        try:
+            os.remove(self._body_path(url))
+        except FileNotFoundError:
+            pass
+        self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+        self._conn.commit()
+
+    def total_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        for url, size in self._conn.execute("SELECT url, size FROM entries ORDER BY last_used").fetchall():
+            if excess <= 0:
+                break
+            self.discard(url)
+            excess -= size
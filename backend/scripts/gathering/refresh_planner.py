@@ -0,0 +1,125 @@
+import argparse
+import csv
+import json
+import os
+from datetime import datetime, timezone
+
+# Get the path to the scripts directory (parent of gathering)
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Order reasons are reported in; a commander is listed under the first that applies
+REFRESH_REASONS = ['new', 'rank', 'deck_count', 'rotation']
+
+
+def parse_deck_count(value):
+    """EDHREC's Deck_Count column is formatted with thousands separators ("35,568")."""
+    return int(str(value).replace(',', ''))
+
+
+def read_commander_rows(csv_path, limit=None):
+    """[{commander, rank, deck_count}] from the EDHREC commanders CSV, in rank order."""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = [
+            {
+                'commander': row['Commander'],
+                'rank': int(row['Rank']),
+                'deck_count': parse_deck_count(row['Deck_Count'])
+            }
+            for row in csv.DictReader(f)
+        ]
+    return rows[:limit] if limit else rows
+
+
+def load_snapshot(snapshot_path):
+    """
+    {commander: {rank, deck_count, fetched_at}} as of each commander's last
+    successful fetch, or {} if there's no snapshot yet.
+    """
+    if not os.path.exists(snapshot_path):
+        return {}
+    with open(snapshot_path) as f:
+        return json.load(f)
+
+
+def save_snapshot(snapshot, snapshot_path):
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, snapshot_path)
+
+
+def update_snapshot(snapshot, rows, refreshed, fetched_at=None):
+    """Record the CSV values of the commanders that were just refreshed."""
+    fetched_at = fetched_at or datetime.now(timezone.utc).isoformat(timespec='seconds')
+    refreshed = set(refreshed)
+    for row in rows:
+        if row['commander'] in refreshed:
+            snapshot[row['commander']] = {
+                'rank': row['rank'],
+                'deck_count': row['deck_count'],
+                'fetched_at': fetched_at
+            }
+    return snapshot
+
+
+def plan_refresh(rows, snapshot, rank_threshold=10, deck_change=0.1, rotation=10, available=None):
+    """
+    Pick the commanders worth refetching: ones not in the snapshot (or with
+    no data in `available`, the current results), ones whose rank moved by
+    more than rank_threshold places, and ones whose deck count changed by
+    more than deck_change (a fraction). On top of that, the `rotation`
+    commanders fetched longest ago are refreshed so nothing goes stale
+    forever.
+
+    Returns {commander: reason} in rank order.
+    """
+    plan = {}
+    unchanged = []
+    for row in rows:
+        commander = row['commander']
+        previous = snapshot.get(commander)
+        if previous is None or (available is not None and not available.get(commander)):
+            plan[commander] = 'new'
+        elif abs(row['rank'] - previous['rank']) > rank_threshold:
+            plan[commander] = 'rank'
+        elif abs(row['deck_count'] - previous['deck_count']) > deck_change * max(previous['deck_count'], 1):
+            plan[commander] = 'deck_count'
+        else:
+            unchanged.append((previous['fetched_at'], row['rank'], commander))
+
+    for _, _, commander in sorted(unchanged)[:rotation]:
+        plan[commander] = 'rotation'
+    rank_order = {row['commander']: i for i, row in enumerate(rows)}
+    return dict(sorted(plan.items(), key=lambda item: rank_order[item[0]]))
+
+
+def print_plan(plan, total):
+    counts = {reason: sum(1 for r in plan.values() if r == reason) for reason in REFRESH_REASONS}
+    summary = ', '.join(f"{count} {reason}" for reason, count in counts.items() if count)
+    print(f"Refresh plan: {len(plan)} of {total} commanders" + (f" ({summary})" if summary else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show which commanders a refresh would refetch")
+    parser.add_argument('--csv', default='edhrec_commanders_complete.csv',
+                        help="Commander list CSV, relative to the scripts directory")
+    parser.add_argument('--limit', type=int, default=200, help="Number of top commanders considered (default: 200)")
+    parser.add_argument('--snapshot', default='../data/refresh_snapshot.json',
+                        help="Snapshot of the last fetch, relative to the scripts directory")
+    parser.add_argument('--rank-threshold', type=int, default=10,
+                        help="Refetch commanders that moved more than this many ranks (default: 10)")
+    parser.add_argument('--deck-change', type=float, default=0.1,
+                        help="Refetch commanders whose deck count changed by more than this fraction (default: 0.1)")
+    parser.add_argument('--rotation', type=int, default=10,
+                        help="Also refetch this many of the longest-unfetched commanders (default: 10)")
+    args = parser.parse_args(argv)
+
+    rows = read_commander_rows(os.path.join(SCRIPTS_DIR, args.csv), args.limit)
+    snapshot = load_snapshot(os.path.join(SCRIPTS_DIR, args.snapshot))
+    plan = plan_refresh(rows, snapshot, args.rank_threshold, args.deck_change, args.rotation)
+    print_plan(plan, len(rows))
+    for commander, reason in plan.items():
+        print(f"  {commander}: {reason}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .edhrec_extract import extract_commander_data
+from .refresh_planner import read_commander_rows
+
+# Get the path to the scripts directory (parent of gathering)
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INDEX_SUFFIX = '.idx'
+
+
+def index_path_for(pack_path):
+    """The offset index lives next to the pack: edhrec_pages.pack.idx"""
+    return pack_path + INDEX_SUFFIX
+
+
+def read_pack_index(pack_path):
+    """
+    {commander: (offset, length)} of each commander's latest page in the
+    pack. Index records are only written after their page, so a torn last
+    index line (or page bytes with no index record) from a crash is ignored.
+    """
+    index = {}
+    index_path = index_path_for(pack_path)
+    if not os.path.exists(index_path):
+        return index
+    pack_size = os.path.getsize(pack_path) if os.path.exists(pack_path) else 0
+    with open(index_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record['offset'] + record['length'] <= pack_size:
+                index[record['commander']] = (record['offset'], record['length'])
+    return index
+
+
+class ResponsePackWriter:
+    """
+    Append-only archive of raw EDHREC responses. Each page is zlib-compressed
+    and appended to the pack; an NDJSON index records where it went. A
+    refetched page is appended again and the index's later record wins, so
+    nothing is ever rewritten in place.
+    """
+
+    def __init__(self, pack_path, level=6):
+        self.pack_path = pack_path
+        self.level = level
+        os.makedirs(os.path.dirname(os.path.abspath(pack_path)), exist_ok=True)
+        self.index = read_pack_index(pack_path)
+        self._pack = open(pack_path, 'ab')
+        self._index = open(index_path_for(pack_path), 'a', encoding='utf-8')
+        # Start on a fresh line if the last run died mid-record
+        if self._index.tell() > 0:
+            with open(index_path_for(pack_path), 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._index.write('\n')
+
+    def __contains__(self, commander):
+        return commander in self.index
+
+    def append(self, commander, body):
+        data = zlib.compress(body, self.level)
+        offset = self._pack.seek(0, os.SEEK_END)
+        self._pack.write(data)
+        self._pack.flush()
+        record = {'commander': commander, 'offset': offset, 'length': len(data)}
+        self._index.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._index.flush()
+        self.index[commander] = (offset, len(data))
+
+    def close(self):
+        self._pack.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_pack_page(pack_path, offset, length, f=None):
+    """Raw page bytes of one pack record."""
+    if f is None:
+        with open(pack_path, 'rb') as f:
+            return read_pack_page(pack_path, offset, length, f)
+    f.seek(offset)
+    return zlib.decompress(f.read(length))
+
+
+def _extract_entries(pack_path, entries):
+    """Worker: extract [(commander, offset, length)] from the pack. Returns [(commander, data)]."""
+    results = []
+    with open(pack_path, 'rb') as f:
+        for commander, offset, length in entries:
+            try:
+                data = extract_commander_data(commander, json.loads(read_pack_page(pack_path, offset, length, f)))
+            except (zlib.error, json.JSONDecodeError) as e:
+                print(f"Error extracting {commander}: {e}")
+                data = None
+            results.append((commander, data))
+    return results
+
+
+def reextract_pack(pack_path, commanders=None, workers=1, chunks_per_worker=4):
+    """
+    Rebuild {commander: data} from the archived pages, without any HTTP.
+    Defaults to every commander in the pack, in the order they were first
+    archived; pass commanders to pick and order them (missing ones are None).
+    With workers > 1 the pages are extracted in a process pool, each worker
+    reading its share of records straight from the pack.
+    """
+    index = read_pack_index(pack_path)
+    commanders = list(index) if commanders is None else commanders
+    entries = [(commander, *index[commander]) for commander in commanders if commander in index]
+    # Sequential offsets keep each worker's reads moving forward through the file
+    entries.sort(key=lambda entry: entry[1])
+
+    extracted = {}
+    if workers > 1 and entries:
+        num_chunks = min(len(entries), workers * chunks_per_worker)
+        chunks = [entries[i::num_chunks] for i in range(num_chunks)]
+        print(f"Extracting {len(entries)} pages in {num_chunks} chunks with {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_results in executor.map(partial(_extract_entries, pack_path), chunks):
+                extracted.update(chunk_results)
+    else:
+        extracted.update(_extract_entries(pack_path, entries))
+    return {commander: extracted.get(commander) for commander in commanders}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild extracted commander data from archived EDHREC pages")
+    parser.add_argument('--pack', default='../data/edhrec_pages.pack',
+                        help="Raw response pack, relative to the scripts directory")
+    parser.add_argument('--out', default='../data/extracted_commander_data.json',
+                        help="Output file, relative to the scripts directory")
+    parser.add_argument('--csv', help="Only extract commanders from this CSV, in its order "
+                                      "(default: everything in the pack)")
+    parser.add_argument('--limit', type=int, help="With --csv, number of top commanders")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Extraction processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    commanders = None
+    if args.csv:
+        commanders = [row['commander'] for row in read_commander_rows(os.path.join(SCRIPTS_DIR, args.csv),
+                                                                        args.limit)]
+    results = reextract_pack(os.path.join(SCRIPTS_DIR, args.pack), commanders, args.workers)
+
+    output_path = os.path.join(SCRIPTS_DIR, args.out)
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, output_path)
+    failed = sum(1 for data in results.values() if data is None)
+    print(f"Data exported to: {output_path} ({len(results) - failed} commanders, {failed} missing or failed)")
+
+if __name__ == "__main__":
+    main()
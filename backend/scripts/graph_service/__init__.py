@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The service reads the pipeline's viz_preparation package, a sibling in the
+# scripts directory. Put that directory on the path so the service starts the
+# same way whether it's run as `python -m graph_service.app` from the scripts
+# directory, as backend.scripts.graph_service.app from the repository root,
+# or by uvicorn with --factory.
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,114 @@
+import argparse
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+
+from . import SCRIPTS_DIR
+from .graph_index import GraphIndex
+from viz_preparation.sparsification import WEIGHT_METRICS
+
+Metric = Enum('Metric', {metric: metric for metric in WEIGHT_METRICS}, type=str)
+
+
+def _etag(index, request):
+    """Weak ETag from the loaded data's version and the request's path and query."""
+    query = sorted(request.query_params.multi_items())
+    key = json.dumps([request.url.path, query]).encode('utf-8')
+    return f'W/"{index.version}-{hashlib.sha1(key).hexdigest()[:16]}"'
+
+
+def _json_response(request, build):
+    """
+    JSON response with an ETag. If the client already has this ETag the
+    body isn't built at all and a 304 goes back instead.
+    """
+    index = request.app.state.index
+    etag = _etag(index, request)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if etag in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*':
+        return Response(status_code=304, headers=headers)
+    body = json.dumps(build(index), separators=(',', ':')).encode('utf-8')
+    return Response(body, media_type='application/json', headers=headers)
+
+
+def create_app(data_dir=None):
+    """
+    FastAPI app serving the pipeline output in data_dir (default: the
+    scripts' viz_data). The graph is loaded once at startup into a
+    GraphIndex; restart the service to pick up a new pipeline run.
+    """
+    data_dir = data_dir or os.environ.get('GRAPH_DATA_DIR') or os.path.join(SCRIPTS_DIR, 'viz_data')
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.index = GraphIndex.load(data_dir)
+        print(f"Loaded {len(app.state.index.nodes)} nodes and {app.state.index.edge_count} edges "
+              f"from {data_dir}")
+        yield
+
+    app = FastAPI(title="Commander graph", lifespan=lifespan)
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+    # Node ids are commander names, which can contain "/", so they're passed as query parameters
+
+    @app.get('/meta')
+    def meta(request: Request):
+        """Node and edge counts, the available weight metrics and the data version."""
+        return _json_response(request, lambda index: {
+            'version': index.version,
+            'node_count': len(index.nodes),
+            'edge_count': index.edge_count,
+            'metrics': index.metrics
+        })
+
+    @app.get('/nodes')
+    def nodes(request: Request, id: Optional[List[str]] = Query(None)):
+        """All nodes, or only the given ids (repeat the id parameter)."""
+        index = request.app.state.index
+        if id is not None:
+            missing = [node_id for node_id in id if node_id not in index.node_index]
+            if missing:
+                raise HTTPException(404, f"Unknown node(s): {', '.join(missing)}")
+        return _json_response(request, lambda index: index.nodes if id is None else
+                              [index.nodes[index.node_index[node_id]] for node_id in id])
+
+    @app.get('/edges')
+    def edges(request: Request, metric: Metric = Metric.composite_weight,
+              min_weight: float = Query(0.0, ge=0), limit: Optional[int] = Query(None, ge=1)):
+        """Edges with the metric at least min_weight; with limit, only the strongest ones."""
+        return _json_response(request, lambda index: index.edges(metric.value, min_weight, limit))
+
+    @app.get('/neighbors')
+    def neighbors(request: Request, id: str, metric: Metric = Metric.composite_weight,
+                  min_weight: float = Query(0.0, ge=0), limit: Optional[int] = Query(None, ge=1)):
+        """A node's neighbors by the metric, strongest first."""
+        if id not in request.app.state.index.node_index:
+            raise HTTPException(404, f"Unknown node: {id}")
+        return _json_response(request, lambda index: {
+            'id': id,
+            'metric': metric.value,
+            'neighbors': index.neighbors(id, metric.value, min_weight, limit)
+        })
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the commander graph over HTTP")
+    parser.add_argument('--data-dir', default='viz_data',
+                        help="Pipeline output directory, relative to the scripts directory")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on (default: 8000)")
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(os.path.join(SCRIPTS_DIR, args.data_dir)), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from viz_preparation.artifacts import content_hash
+from viz_preparation.graph_bundle import WEIGHT_SCALE, read_graph_bundle_columns
+from viz_preparation.sparsification import WEIGHT_METRICS
+
+
+class GraphIndex:
+    """
+    The pipeline's graph held as columns, for serving.
+
+    Edges are numpy columns (source and target node indexes, one uint16
+    fixed-point weight column per metric) rather than dicts. For neighbor
+    lookups every node's edges are grouped CSR-style, sorted by weight
+    (descending) once per metric, so a node's neighbors above a threshold
+    are a slice found by binary search.
+
+    version identifies the loaded data (a hash of the source files) and is
+    what response ETags are built from.
+    """
+
+    def __init__(self, nodes, source, target, weights, weight_scale=WEIGHT_SCALE, version=''):
+        self.nodes = nodes
+        self.node_index = {node['id']: i for i, node in enumerate(nodes)}
+        self.ids = [node['id'] for node in nodes]
+        self.source = np.asarray(source, dtype=np.uint32)
+        self.target = np.asarray(target, dtype=np.uint32)
+        self.weights = {metric: np.asarray(values, dtype=np.uint16) for metric, values in weights.items()}
+        self.metrics = list(self.weights)
+        self.weight_scale = weight_scale
+        self.version = version
+
+        # Each edge appears under both endpoints; offsets[i]:offsets[i + 1] is node i's range
+        edge_count = len(self.source)
+        endpoints = np.concatenate([self.source, self.target])
+        edge_ids = np.concatenate([np.arange(edge_count, dtype=np.uint32)] * 2)
+        self.offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(endpoints, minlength=len(nodes)), out=self.offsets[1:])
+        self.adjacency = {}
+        for metric, values in self.weights.items():
+            order = np.lexsort((-values[edge_ids].astype(np.int32), endpoints))
+            self.adjacency[metric] = edge_ids[order]
+
+    @property
+    def edge_count(self):
+        return len(self.source)
+
+    @classmethod
+    def from_bundle(cls, filepath):
+        header, nodes, columns = read_graph_bundle_columns(filepath)
+        weights = {metric: columns[metric] for metric in header['metrics']}
+        return cls(nodes, columns['source'], columns['target'], weights, header['weight_scale'],
+                   content_hash(filepath))
+
+    @classmethod
+    def from_json(cls, nodes_path, edges_path):
+        """Build the columns from nodes.json and edges.json (or edges.ndjson) when there's no bundle."""
+        with open(nodes_path) as f:
+            nodes = json.load(f)
+        node_index = {node['id']: i for i, node in enumerate(nodes)}
+        with open(edges_path) as f:
+            edges = json.load(f) if edges_path.endswith('.json') else (json.loads(line) for line in f)
+            source, target = [], []
+            weights = {metric: [] for metric in WEIGHT_METRICS}
+            for edge in edges:
+                source.append(node_index[edge['source']])
+                target.append(node_index[edge['target']])
+                for metric, values in weights.items():
+                    values.append(round(edge[metric] * WEIGHT_SCALE))
+        version = content_hash(nodes_path)[:8] + content_hash(edges_path)[:8]
+        return cls(nodes, source, target, weights, WEIGHT_SCALE, version)
+
+    @classmethod
+    def load(cls, data_dir):
+        """Load viz_data output, preferring the binary bundle over the JSON files."""
+        bundle_path = os.path.join(data_dir, 'graph.bin')
+        if os.path.exists(bundle_path):
+            return cls.from_bundle(bundle_path)
+        nodes_path = os.path.join(data_dir, 'nodes.json')
+        for edges_file in ('edges.json', 'edges.ndjson'):
+            edges_path = os.path.join(data_dir, edges_file)
+            if os.path.exists(edges_path):
+                return cls.from_json(nodes_path, edges_path)
+        raise FileNotFoundError(f"No graph.bin or edges.json/edges.ndjson in {data_dir}")
+
+    def _threshold(self, min_weight):
+        """Smallest fixed-point weight that is >= min_weight."""
+        return math.ceil(round(min_weight * self.weight_scale, 6))
+
+    def edge_dicts(self, edge_ids):
+        """Edges in the edges.json shape."""
+        ids = self.ids
+        sources = self.source[edge_ids].tolist()
+        targets = self.target[edge_ids].tolist()
+        columns = [(metric, (self.weights[metric][edge_ids] / self.weight_scale).tolist())
+                   for metric in self.metrics]
+        edges = []
+        for k, (i, j) in enumerate(zip(sources, targets)):
+            edge = {'source': ids[i], 'target': ids[j]}
+            for metric, values in columns:
+                edge[metric] = values[k]
+            edges.append(edge)
+        return edges
+
+    def edges(self, metric, min_weight=0.0, limit=None):
+        """Edges whose metric is at least min_weight, strongest first when limited to `limit`."""
+        values = self.weights[metric]
+        edge_ids = np.flatnonzero(values >= self._threshold(min_weight))
+        if limit is not None and limit < len(edge_ids):
+            top = np.argpartition(-values[edge_ids].astype(np.int32), limit - 1)[:limit]
+            edge_ids = edge_ids[top]
+            edge_ids = edge_ids[np.argsort(-values[edge_ids].astype(np.int32), kind='stable')]
+        return self.edge_dicts(edge_ids)
+
+    def neighbors(self, node_id, metric, min_weight=0.0, limit=None):
+        """
+        [{id, weight}] of a node's neighbors with the metric at least
+        min_weight, strongest first. Raises KeyError for an unknown node.
+        """
+        i = self.node_index[node_id]
+        edge_ids = self.adjacency[metric][self.offsets[i]:self.offsets[i + 1]]
+        values = self.weights[metric][edge_ids]
+        # values are sorted descending, so the matches are a prefix
+        count = int(np.searchsorted(-values.astype(np.int32), -self._threshold(min_weight), side='right'))
+        if limit is not None:
+            count = min(count, limit)
+        edge_ids = edge_ids[:count]
+        sources = self.source[edge_ids]
+        others = np.where(sources == i, self.target[edge_ids], sources).tolist()
+        weights = (values[:count] / self.weight_scale).tolist()
+        return [{'id': self.ids[j], 'weight': weight} for j, weight in zip(others, weights)]
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the pipeline packages the same way the scripts are run: from the scripts directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+class StubResponse:
+    """One scripted reply: status, body (bytes, str, or anything JSON-encodable), headers and a delay."""
+
+    def __init__(self, status=200, body=None, headers=None, delay=0):
+        self.status = status
+        if isinstance(body, (bytes, str)) or body is None:
+            self.body = body.encode('utf-8') if isinstance(body, str) else (body or b'')
+        else:
+            self.body = json.dumps(body).encode('utf-8')
+        self.headers = headers or {}
+        self.delay = delay
+
+
+class EdhrecStub:
+    """
+    Local stand-in for EDHREC's JSON pages. Each path has a script of
+    StubResponses played in order; the last one repeats once the script runs
+    out. Unknown paths are 404s. Every request is recorded as
+    (path, headers) in requests.
+
+        async with EdhrecStub({'/commanders/a.json': [StubResponse(429), StubResponse(body={...})]}) as stub:
+            EdhrecClient(base_url=stub.base_url, ...)
+    """
+
+    def __init__(self, scripts=None):
+        self.scripts = {path: list(replies) for path, replies in (scripts or {}).items()}
+        self.requests = []
+        self._server = None
+
+    def hits(self, path):
+        return sum(1 for requested, _ in self.requests if requested == path)
+
+    async def _handle(self, request):
+        self.requests.append((request.path, dict(request.headers)))
+        script = self.scripts.get(request.path)
+        if not script:
+            return web.Response(status=404)
+        reply = script.pop(0) if len(script) > 1 else script[0]
+        if reply.delay:
+            await asyncio.sleep(reply.delay)
+        return web.Response(status=reply.status, body=reply.body, headers=reply.headers)
+
+    @property
+    def base_url(self):
+        return str(self._server.make_url('')).rstrip('/')
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self._handle)
+        self._server = TestServer(app)
+        await self._server.start_server()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._server.close()
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from edhrec_stub import EdhrecStub, StubResponse
+from gathering.checkpoint import CheckpointWriter
+from gathering.async_gatherer import EdhrecClient, FetchError, gather_commanders
+from gathering.http_cache import ResponseCache
+
+# Fast retries; the stub answers locally, so the backoff is the only real wait
+CLIENT_OPTIONS = {'rate': 1000, 'retries': 2, 'backoff': 0.01, 'timeout': 0.5}
+
+
+def commander_page(name, deck_count=1234, rank=7):
+    """The parts of an EDHREC commander page that extract_commander_data reads."""
+    return {
+        'container': {'json_dict': {
+            'card': {'label': f"{deck_count} decks (0.5%)\nRank #{rank}", 'color_identity': ['G'],
+                     'sanitized': name.lower()},
+            'cardlists': [{'header': 'Creatures', 'cardviews': [{'name': 'Llanowar Elves', 'num_decks': 10}]}]
+        }},
+        'panels': {'tribelinks': [{'value': 'Elves', 'count': 100}]}
+    }
+
+
+def run(scripts, test, cache=None):
+    """Run test(stub, client) against a stub serving the given scripts."""
+    async def main():
+        async with EdhrecStub(scripts) as stub:
+            async with EdhrecClient(base_url=stub.base_url, cache=cache, **CLIENT_OPTIONS) as client:
+                return await test(stub, client)
+    return asyncio.run(main())
+
+
+def test_retries_429_with_retry_after():
+    path = '/commanders/a.json'
+    scripts = {path: [StubResponse(429, headers={'Retry-After': '0.05'}), StubResponse(body={'ok': 1})]}
+
+    async def test(stub, client):
+        assert await client.get_json(f"{stub.base_url}{path}") == {'ok': 1}
+        assert stub.hits(path) == 2
+    run(scripts, test)
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504])
+def test_retries_server_errors(status):
+    path = '/commanders/a.json'
+    scripts = {path: [StubResponse(status), StubResponse(status), StubResponse(body={'ok': 1})]}
+
+    async def test(stub, client):
+        assert await client.get_json(f"{stub.base_url}{path}") == {'ok': 1}
+        assert stub.hits(path) == 3
+    run(scripts, test)
+
+
+def test_gives_up_after_retries():
+    path = '/commanders/a.json'
+
+    async def test(stub, client):
+        with pytest.raises(FetchError, match='gave up after 3 attempts'):
+            await client.get_json(f"{stub.base_url}{path}")
+        assert stub.hits(path) == 3
+    run({path: [StubResponse(503)]}, test)
+
+
+def test_does_not_retry_404():
+    async def test(stub, client):
+        with pytest.raises(FetchError, match='HTTP 404'):
+            await client.get_json(f"{stub.base_url}/commanders/missing.json")
+        assert stub.hits('/commanders/missing.json') == 1
+    run({}, test)
+
+
+def test_retries_timeouts():
+    path = '/commanders/a.json'
+    scripts = {path: [StubResponse(body={'ok': 1}, delay=2), StubResponse(body={'ok': 1})]}
+
+    async def test(stub, client):
+        assert await client.get_json(f"{stub.base_url}{path}") == {'ok': 1}
+        assert stub.hits(path) == 2
+    run(scripts, test)
+
+
+def test_gives_up_on_repeated_timeouts():
+    path = '/commanders/a.json'
+
+    async def test(stub, client):
+        with pytest.raises(FetchError, match='TimeoutError'):
+            await client.get_json(f"{stub.base_url}{path}")
+    run({path: [StubResponse(body={'ok': 1}, delay=2)]}, test)
+
+
+def test_invalid_json_is_a_fetch_error():
+    path = '/commanders/a.json'
+
+    async def test(stub, client):
+        with pytest.raises(FetchError, match='invalid JSON'):
+            await client.get_json(f"{stub.base_url}{path}")
+    run({path: [StubResponse(body='{"truncated": ')]}, test)
+
+
+def test_gather_commanders_keeps_going_past_failures():
+    scripts = {
+        '/commanders/good.json': [StubResponse(503), StubResponse(body=commander_page('Good'))],
+        '/commanders/broken.json': [StubResponse(body='not json')],
+        '/commanders/flaky.json': [StubResponse(429, headers={'Retry-After': '0'}),
+                                   StubResponse(body=commander_page('Flaky', rank=3))]
+    }
+
+    async def test(stub, client):
+        return await gather_commanders(['Good', 'Broken', 'Missing', 'Flaky'], client)
+    results = run(scripts, test)
+
+    assert list(results) == ['Good', 'Broken', 'Missing', 'Flaky']
+    assert results['Broken'] is None
+    assert results['Missing'] is None
+    assert results['Good']['deck_count'] == 1234
+    assert results['Flaky']['rank'] == 3
+    assert results['Flaky']['card_groups'] == {
+        'Creatures': [{'name': 'Llanowar Elves', 'sanitized': None, 'synergy': None, 'inclusion': None,
+                       'num_decks': 10}]
+    }
+
+
+def test_revalidates_against_the_cache(tmp_path):
+    path = '/commanders/a.json'
+    scripts = {path: [StubResponse(body={'v': 1}, headers={'ETag': '"1"'}), StubResponse(304)]}
+    cache = ResponseCache(str(tmp_path))
+
+    async def test(stub, client):
+        url = f"{stub.base_url}{path}"
+        assert await client.get_body(url) == (b'{"v": 1}', True)
+        assert await client.get_body(url) == (b'{"v": 1}', False)
+        assert stub.requests[-1][1].get('If-None-Match') == '"1"'
+        assert (client.downloaded, client.not_modified) == (1, 1)
+    run(scripts, test, cache)
+    cache.close()
+
+
+def test_body_evicted_before_a_304_is_refetched(tmp_path):
+    path = '/commanders/a.json'
+    scripts = {path: [StubResponse(body={'v': 1}, headers={'ETag': '"1"'}), StubResponse(304),
+                      StubResponse(body={'v': 2}, headers={'ETag': '"2"'})]}
+    cache = ResponseCache(str(tmp_path))
+
+    # Evict the body right after the conditional headers are built, as another task's put() could
+    conditional_headers = cache.conditional_headers
+
+    def conditional_headers_then_evict(url):
+        headers = conditional_headers(url)
+        if headers:
+            os.remove(cache._body_path(url))
+        return headers
+    cache.conditional_headers = conditional_headers_then_evict
+
+    async def test(stub, client):
+        url = f"{stub.base_url}{path}"
+        await client.get_body(url)
+        assert await client.get_body(url) == (b'{"v": 2}', True)
+        assert 'If-None-Match' not in stub.requests[-1][1]
+        assert stub.hits(path) == 3
+    run(scripts, test, cache)
+    cache.close()
+
+
+def test_retry_after_is_capped():
+    path = '/commanders/a.json'
+    scripts = {path: [StubResponse(429, headers={'Retry-After': '3600'}), StubResponse(body={'ok': 1})]}
+
+    async def main():
+        async with EdhrecStub(scripts) as stub:
+            async with EdhrecClient(base_url=stub.base_url, max_retry_delay=0.05, **CLIENT_OPTIONS) as client:
+                return await asyncio.wait_for(client.get_json(f"{stub.base_url}{path}"), 5)
+    assert asyncio.run(main()) == {'ok': 1}
+
+
+class FailingPack:
+    """A ResponsePackWriter whose disk is full."""
+
+    def __contains__(self, commander):
+        return False
+
+    def append(self, commander, body):
+        raise OSError(28, 'No space left on device')
+
+
+def test_unexpected_errors_are_checkpointed(tmp_path):
+    scripts = {'/commanders/good.json': [StubResponse(body=commander_page('Good'))]}
+    checkpoint_path = str(tmp_path / 'checkpoint.ndjson')
+
+    async def test(stub, client):
+        with CheckpointWriter(checkpoint_path) as checkpoint:
+            return await gather_commanders(['Good', 'Missing'], client, checkpoint=checkpoint, pack=FailingPack())
+    results = run(scripts, test)
+
+    assert results == {'Good': None, 'Missing': None}
+    with open(checkpoint_path) as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(record['commander'] for record in records) == ['Good', 'Missing']
+    errors = {record['commander']: record['error'] for record in records}
+    assert 'OSError' in errors['Good'] and 'No space left' in errors['Good']
+    assert 'HTTP 404' in errors['Missing']
@@ -0,0 +1,39 @@
+from viz_preparation.card_index import build_card_index, generate_candidate_pairs
+from viz_preparation.commander_store import CommanderData
+
+
+def commander(**groups):
+    return {'card_groups': {group: [{'name': name} for name in names] for group, names in groups.items()}}
+
+
+COMMANDERS = CommanderData({
+    'A': commander(Creatures=['Llanowar Elves', 'Elvish Mystic'], **{'Mana Artifacts': ['Sol Ring']}),
+    'B': commander(Creatures=['Llanowar Elves', 'Elvish Mystic'], Lands=['Forest']),
+    'C': commander(Creatures=['Goblin Guide'], **{'Mana Artifacts': ['Sol Ring']}),
+    'D': commander(Creatures=['Llanowar Elves'], Lands=['Forest']),
+    'E': commander(Instants=['Counterspell'])
+})
+NAMES = list(COMMANDERS)
+
+
+def candidates(staples=None, block_size=512):
+    card_index = build_card_index(COMMANDERS, NAMES)
+    return list(generate_candidate_pairs(card_index, len(NAMES), staples, block_size=block_size))
+
+
+def test_rows_carry_shared_card_counts():
+    assert candidates() == [
+        (0, [1, 2, 3], [2, 1, 1]),
+        (1, [3], [2]),
+        (2, [], []),
+        (3, [], []),
+        (4, [], [])
+    ]
+
+
+def test_staples_alone_dont_make_a_pair():
+    assert [(i, js) for i, js, _ in candidates(staples=['Sol Ring'])][:2] == [(0, [1, 3]), (1, [3])]
+
+
+def test_block_size_doesnt_change_rows():
+    assert candidates(block_size=1) == candidates(block_size=2) == candidates()
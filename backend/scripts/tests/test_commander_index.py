@@ -0,0 +1,112 @@
+import asyncio
+import csv
+
+import pytest
+
+from edhrec_stub import EdhrecStub, StubResponse
+from gathering.async_gatherer import EdhrecClient
+from gathering.commander_index import cardview_deck_count, iter_commander_index, write_commander_index
+
+CLIENT_OPTIONS = {'rate': 1000, 'retries': 2, 'backoff': 0.01, 'timeout': 0.5}
+
+# Recorded shapes of the listing: the first page nests its lists like a
+# commander page, the pages behind "more" carry them at the top level
+FIRST_PAGE = {
+    'container': {'json_dict': {'cardlists': [{
+        'header': 'Commanders',
+        'cardviews': [
+            {'name': 'Atraxa, Praetors\' Voice', 'num_decks': 35568, 'label': '35,568 decks'},
+            {'name': 'The Ur-Dragon', 'label': '30,112 decks'}
+        ],
+        'more': 'commanders/year-1.json'
+    }]}}
+}
+SECOND_PAGE = {
+    'cardviews': [
+        # Shifted down from the first page while the listing was paged through
+        {'name': 'The Ur-Dragon', 'label': '30,112 decks'},
+        {'name': 'Edgar Markov', 'num_decks': 28001},
+        {'name': 'Yuriko, the Tiger\'s Shadow', 'label': '1,204 decks'}
+    ],
+    'more': '/commanders/year-2.json'
+}
+LAST_PAGE = {'cardviews': [{'name': 'Krenko, Mob Boss', 'num_decks': 999}]}
+
+LISTING = {
+    '/commanders/year.json': [StubResponse(body=FIRST_PAGE)],
+    '/commanders/year-1.json': [StubResponse(body=SECOND_PAGE)],
+    '/commanders/year-2.json': [StubResponse(body=LAST_PAGE)]
+}
+
+
+def collect(scripts, **options):
+    async def main():
+        async with EdhrecStub(scripts) as stub:
+            async with EdhrecClient(base_url=stub.base_url, **CLIENT_OPTIONS) as client:
+                return [row async for row in iter_commander_index(client, **options)], stub
+    return asyncio.run(main())
+
+
+def test_follows_more_links_and_falls_back_to_labels():
+    rows, stub = collect(LISTING)
+    assert rows == [
+        (1, 'Atraxa, Praetors\' Voice', 35568),
+        (2, 'The Ur-Dragon', 30112),
+        (3, 'Edgar Markov', 28001),
+        (4, 'Yuriko, the Tiger\'s Shadow', 1204),
+        (5, 'Krenko, Mob Boss', 999)
+    ]
+    assert [path for path, _ in stub.requests] == list(LISTING)
+
+
+def test_limit_stops_paging():
+    rows, stub = collect(LISTING, limit=2)
+    assert [name for _, name, _ in rows] == ['Atraxa, Praetors\' Voice', 'The Ur-Dragon']
+    assert stub.hits('/commanders/year-1.json') == 0
+
+
+@pytest.mark.parametrize('cardview', [
+    {'name': 'No Count'},
+    {'name': 'Bad Label', 'label': 'Rank #12'},
+    {'name': 'Empty Label', 'label': ''}
+])
+def test_missing_deck_count_is_an_error(cardview):
+    with pytest.raises(ValueError, match=cardview['name']):
+        cardview_deck_count(cardview)
+
+
+def test_write_keeps_previous_csv_when_a_count_is_missing(tmp_path):
+    output_path = str(tmp_path / 'commanders.csv')
+    scripts = {
+        '/commanders/year.json': [StubResponse(body={'cardviews': [{'name': 'Atraxa, Praetors\' Voice',
+                                                                    'num_decks': 35568}],
+                                                     'more': 'commanders/year-1.json'})],
+        '/commanders/year-1.json': [StubResponse(body={'cardviews': [{'name': 'No Count'}]})]
+    }
+
+    async def main(scripts):
+        async with EdhrecStub(scripts) as stub:
+            return await write_commander_index(output_path, base_url=stub.base_url, **CLIENT_OPTIONS)
+
+    assert asyncio.run(main(LISTING)) == 5
+    with open(output_path, newline='', encoding='utf-8') as f:
+        written = list(csv.reader(f))
+    assert written[:2] == [['Rank', 'Commander', 'Deck_Count'], ['1', 'Atraxa, Praetors\' Voice', '35,568']]
+
+    with pytest.raises(ValueError, match='No Count'):
+        asyncio.run(main(scripts))
+    with open(output_path, newline='', encoding='utf-8') as f:
+        assert list(csv.reader(f)) == written
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['commanders.csv']
+
+
+def test_more_link_cycle_ends_the_listing():
+    scripts = {
+        '/commanders/year.json': [StubResponse(body={'cardviews': [{'name': 'Edgar Markov', 'num_decks': 28001}],
+                                                     'more': 'commanders/year-1.json'})],
+        '/commanders/year-1.json': [StubResponse(body={'cardviews': [{'name': 'Krenko, Mob Boss', 'num_decks': 999}],
+                                                       'more': 'commanders/year.json'})]
+    }
+    rows, stub = collect(scripts)
+    assert [name for _, name, _ in rows] == ['Edgar Markov', 'Krenko, Mob Boss']
+    assert stub.hits('/commanders/year.json') == 1
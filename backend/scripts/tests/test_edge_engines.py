@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from viz_preparation.commander_store import CommanderData, CommanderStore
+from viz_preparation.data_processors import process_edges, process_nodes
+from viz_preparation.sparse_edges import process_edges_sparse
+from viz_preparation.utils import CARD_CATEGORIES, STAPLE_CARDS
+from viz_preparation.weight_calculators.tribes import normalize_tribe_counts
+from viz_preparation.weight_calculators.uniqueness import calculate_card_frequencies
+
+# The engines round at the same 0.001 step but sum in different orders, so a
+# weight sitting on a rounding boundary can land one step apart
+TOLERANCE = 0.001 + 1e-9
+
+COLORS = ['W', 'U', 'B', 'R', 'G']
+TRIBES = ['Elves', 'Dragons', 'Goblins', 'Zombies', 'Spellslinger', 'Counters']
+
+
+def make_fixture(seed=7, commanders=30, pool=150):
+    """Random commanders drawing cards from a shared pool, so pairs overlap by varying amounts."""
+    rng = random.Random(seed)
+    card_metadata = {}
+    cards = []
+    for k in range(pool):
+        name = STAPLE_CARDS[k] if k < len(STAPLE_CARDS) else f"Card {k}"
+        card_metadata[name] = {'color_identity': rng.sample(COLORS, rng.choice([0, 0, 1, 1, 2]))}
+        cards.append(name)
+    commander_data = {}
+    for k in range(commanders):
+        name = f"Commander {k}"
+        colors = rng.sample(COLORS, rng.randint(1, 5))
+        card_metadata[name] = {'color_identity': colors}
+        groups = {}
+        for category in rng.sample(CARD_CATEGORIES, rng.randint(1, len(CARD_CATEGORIES))):
+            groups[category] = [{'name': card} for card in rng.sample(cards, rng.randint(1, 12))]
+        commander_data[name] = {
+            'deck_count': rng.randint(100, 40000),
+            'rank': k + 1,
+            'color_identity': colors,
+            'tribes': [{'name': tribe, 'count': rng.randint(1, 5000)} for tribe in rng.sample(TRIBES, rng.randint(0, 4))],
+            'card_groups': groups
+        }
+    # Entries the engines have to skip: a failed gather and a commander sharing nothing
+    commander_data['Failed'] = None
+    commander_data['Loner'] = {'deck_count': 50, 'rank': commanders + 1, 'color_identity': ['U'], 'tribes': [],
+                               'card_groups': {'Creatures': [{'name': 'Only Mine'}]}}
+    card_metadata['Only Mine'] = {'color_identity': ['U']}
+    return commander_data, card_metadata
+
+
+def edge_map(edges):
+    return {(edge['source'], edge['target']): edge for edge in edges}
+
+
+@pytest.mark.parametrize('store', [False, True])
+@pytest.mark.parametrize('staples', [None, STAPLE_CARDS])
+def test_sparse_engine_matches_pairwise(store, staples):
+    commander_data, card_metadata = make_fixture()
+    commander_data = CommanderData(commander_data)
+    if store:
+        commander_data = CommanderStore.from_commander_data(commander_data)
+    nodes = process_nodes(commander_data, card_metadata)
+    inputs = (commander_data, nodes, card_metadata, calculate_card_frequencies(commander_data),
+              normalize_tribe_counts(commander_data))
+
+    pairwise = process_edges(*inputs, staples=staples)
+    sparse = process_edges_sparse(*inputs, staples=staples)
+
+    assert len(pairwise) > 100
+    assert [(e['source'], e['target']) for e in sparse] == [(e['source'], e['target']) for e in pairwise]
+    expected = edge_map(pairwise)
+    for key, edge in edge_map(sparse).items():
+        for metric, value in expected[key].items():
+            if isinstance(value, str):
+                assert edge[metric] == value
+            else:
+                assert abs(edge[metric] - value) <= TOLERANCE, (key, metric, edge[metric], value)
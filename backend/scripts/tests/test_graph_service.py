@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from graph_service.app import create_app
+from viz_preparation.graph_bundle import GraphBundleWriter
+from viz_preparation.sparsification import WEIGHT_METRICS
+
+# Commander names can contain "/", which is why ids go in the query string
+NODES = [{'id': 'Atraxa'}, {'id': 'Edgar'}, {'id': 'Krenko'}, {'id': 'Brisela / Bruna'}]
+
+
+def edge(source, target, composite):
+    weights = {metric: 0.1 for metric in WEIGHT_METRICS}
+    weights['composite_weight'] = composite
+    return {'source': source, 'target': target, **weights}
+
+
+EDGES = [
+    edge('Atraxa', 'Edgar', 0.3),
+    edge('Atraxa', 'Krenko', 0.7),
+    edge('Edgar', 'Brisela / Bruna', 0.5),
+    edge('Krenko', 'Brisela / Bruna', 0.05)
+]
+
+
+@pytest.fixture(params=['bundle', 'json'])
+def client(request, tmp_path):
+    if request.param == 'bundle':
+        bundle = GraphBundleWriter(NODES)
+        for e in EDGES:
+            bundle.add(e)
+        bundle.write(str(tmp_path / 'graph.bin'))
+    else:
+        (tmp_path / 'nodes.json').write_text(json.dumps(NODES))
+        (tmp_path / 'edges.json').write_text(json.dumps(EDGES))
+    with TestClient(create_app(str(tmp_path))) as client:
+        yield client
+
+
+def composite(edges):
+    return [(e['source'], e['target'], e['composite_weight']) for e in edges]
+
+
+def test_meta(client):
+    meta = client.get('/meta').json()
+    assert (meta['node_count'], meta['edge_count']) == (4, 4)
+    assert meta['metrics'] == list(WEIGHT_METRICS)
+
+
+def test_edges_min_weight_and_limit(client):
+    assert len(client.get('/edges').json()) == 4
+    assert composite(client.get('/edges', params={'min_weight': 0.3}).json()) == [
+        ('Atraxa', 'Edgar', 0.3), ('Atraxa', 'Krenko', 0.7), ('Edgar', 'Brisela / Bruna', 0.5)
+    ]
+    assert composite(client.get('/edges', params={'limit': 2}).json()) == [
+        ('Atraxa', 'Krenko', 0.7), ('Edgar', 'Brisela / Bruna', 0.5)
+    ]
+    assert client.get('/edges', params={'metric': 'tribes_weight', 'min_weight': 0.2}).json() == []
+
+
+def test_neighbors_strongest_first(client):
+    response = client.get('/neighbors', params={'id': 'Brisela / Bruna'})
+    assert response.json() == {
+        'id': 'Brisela / Bruna',
+        'metric': 'composite_weight',
+        'neighbors': [{'id': 'Edgar', 'weight': 0.5}, {'id': 'Krenko', 'weight': 0.05}]
+    }
+    atraxa = {'id': 'Atraxa', 'min_weight': 0.3}
+    assert client.get('/neighbors', params=atraxa).json()['neighbors'] == [
+        {'id': 'Krenko', 'weight': 0.7}, {'id': 'Edgar', 'weight': 0.3}
+    ]
+    assert client.get('/neighbors', params={**atraxa, 'limit': 1}).json()['neighbors'] == [
+        {'id': 'Krenko', 'weight': 0.7}
+    ]
+
+
+def test_unknown_ids_are_404(client):
+    assert client.get('/neighbors', params={'id': 'Nobody'}).status_code == 404
+    assert client.get('/nodes', params={'id': ['Atraxa', 'Nobody']}).status_code == 404
+    assert client.get('/nodes', params={'id': ['Atraxa', 'Brisela / Bruna']}).json() == [NODES[0], NODES[3]]
+
+
+def test_invalid_parameters_are_rejected(client):
+    assert client.get('/edges', params={'metric': 'nope'}).status_code == 422
+    assert client.get('/edges', params={'limit': 0}).status_code == 422
+    assert client.get('/edges', params={'min_weight': -1}).status_code == 422
+
+
+def test_etag_revalidation(client):
+    first = client.get('/edges', params={'min_weight': 0.3})
+    etag = first.headers['etag']
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    again = client.get('/edges', params={'min_weight': 0.3}, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.content == b''
+    assert again.headers['etag'] == etag
+
+    other = client.get('/edges', params={'min_weight': 0.5}, headers={'If-None-Match': etag})
+    assert other.status_code == 200
+    assert other.headers['etag'] != etag
+    assert client.get('/meta', headers={'If-None-Match': '*'}).status_code == 304
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Optional (in requirements.txt): without it only gzip variants are written
+    brotli = None
+
+MANIFEST_FILE = 'manifest.json'
+HASH_LENGTH = 12
+CHUNK_SIZE = 1 << 20
+
+# Quality 11 is several times slower than 5 for a few percent smaller files,
+# so it's only worth it for release publishes (--brotli-quality in prepare_viz_data)
+BROTLI_QUALITY = 5
+RELEASE_BROTLI_QUALITY = 11
+
+
+def content_hash(filepath):
+    """Short sha256 of a file's contents, used in the hashed file names."""
+    digest = hashlib.sha256()
+    for chunk in _read_chunks(filepath):
+        digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(filename, file_hash):
+    """nodes.json -> nodes.<hash>.json"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{file_hash}{ext}"
+
+
+def _write_atomic(path, chunks):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+def _read_chunks(filepath):
+    with open(filepath, 'rb') as f:
+        yield from iter(lambda: f.read(CHUNK_SIZE), b'')
+
+
+def _gzip_chunks(filepath, quality=None):
+    # wbits=31 writes a gzip header with no file name and a zero mtime, so
+    # the same input always gives the same bytes
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    for chunk in _read_chunks(filepath):
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+
+def _brotli_chunks(filepath, quality=BROTLI_QUALITY):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in _read_chunks(filepath):
+        yield compressor.process(chunk)
+    yield compressor.finish()
+
+
+ENCODINGS = {
+    'gzip': ('.gz', _gzip_chunks),
+    'br': ('.br', _brotli_chunks)
+}
+
+
+def load_manifest(output_path):
+    manifest_path = os.path.join(output_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {'artifacts': {}, 'previous': []}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _manifest_files(artifacts):
+    files = set()
+    for entry in artifacts.values():
+        files.add(entry['file'])
+        files.update(variant['file'] for variant in entry.get('encodings', {}).values())
+    return files
+
+
+def publish_artifacts(output_path, filenames, brotli_quality=BROTLI_QUALITY):
+    """
+    Write content-hashed copies of the given output files plus gzip and
+    brotli variants, and a manifest.json mapping each logical name to them:
+
+        {"artifacts": {"nodes.json": {"file": "nodes.<hash>.json", "size": ...,
+                                      "encodings": {"gzip": {"file": ..., "size": ...},
+                                                    "br": {"file": ..., "size": ..., "quality": 5}}}},
+         "previous": [...]}
+
+    Files whose hashed name already exists are left alone, so unchanged
+    outputs keep their URLs and aren't compressed again; a brotli variant is
+    only redone when the last manifest has it at a lower quality than
+    brotli_quality (e.g. a release publish after a development run). Hashed files from
+    the last manifest are kept for one more build (listed under "previous")
+    so clients that loaded the old manifest can still fetch them; anything
+    older is removed.
+    """
+    old_manifest = load_manifest(output_path)
+    old_variants = {
+        variant['file']: variant
+        for entry in old_manifest['artifacts'].values()
+        for variant in entry.get('encodings', {}).values()
+    }
+    encodings = {name: spec for name, spec in ENCODINGS.items() if name != 'br' or brotli}
+    if brotli is None:
+        print("brotli isn't installed, writing gzip variants only")
+
+    artifacts = {}
+    for filename in filenames:
+        source = os.path.join(output_path, filename)
+        name = hashed_name(filename, content_hash(source))
+        target = os.path.join(output_path, name)
+        reused = os.path.exists(target)
+        if not reused:
+            _write_atomic(target, _read_chunks(source))
+
+        entry = {'file': name, 'size': os.path.getsize(target), 'encodings': {}}
+        for encoding, (suffix, compress) in encodings.items():
+            variant = os.path.join(output_path, name + suffix)
+            quality = brotli_quality if encoding == 'br' else None
+            old_quality = old_variants.get(name + suffix, {}).get('quality')
+            if not os.path.exists(variant) or (quality and (old_quality or 0) < quality):
+                _write_atomic(variant, compress(source, quality))
+                old_quality = quality
+            entry['encodings'][encoding] = {'file': name + suffix, 'size': os.path.getsize(variant)}
+            if old_quality:
+                entry['encodings'][encoding]['quality'] = old_quality
+        artifacts[filename] = entry
+
+        sizes = ', '.join(f"{encoding} {variant['size']}" for encoding, variant in entry['encodings'].items())
+        print(f"{filename} -> {name} ({entry['size']} bytes; {sizes}){' unchanged' if reused else ''}")
+
+    current = _manifest_files(artifacts)
+    last = _manifest_files(old_manifest['artifacts'])
+    previous = sorted(last - current)
+    for stale in set(old_manifest.get('previous', [])) - current - last:
+        stale_path = os.path.join(output_path, stale)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    manifest = {'artifacts': artifacts, 'previous': previous}
+    _write_atomic(os.path.join(output_path, MANIFEST_FILE),
+                  [json.dumps(manifest, indent=2).encode('utf-8')])
+    return manifest
@@ -0,0 +1,85 @@
+import numpy as np
+from scipy import sparse
+
+from .utils import CARD_CATEGORIES, get_cards_from_category
+
+
+def build_card_index(commander_data, commanders):
+    """
+    Build an inverted index from each card to the commanders that play it.
+
+    Overlap is only counted within a category, so the index is kept per
+    category: card_index[category][card] -> sorted list of commander indices.
+    """
+    card_index = {}
+    for category in CARD_CATEGORIES:
+        category_index = {}
+        for row, commander in enumerate(commanders):
+            for card in set(get_cards_from_category(commander_data, commander, category)):
+                category_index.setdefault(card, []).append(row)
+        card_index[category] = category_index
+    return card_index
+
+
+def build_posting_matrix(card_index, n, staples=None, cards=None):
+    """
+    Sparse commander x posting incidence matrix P: every (category, card)
+    posting list is a column with a 1 in each row that plays the card. Two
+    commanders share a card exactly where P @ P.T is nonzero, and the value
+    there is how many (category, card) postings they share.
+
+    staples: optional card names left out of P, so pairs whose only shared
+    cards are staples never show up. cards: optional card names to keep P to.
+    """
+    staples = set(staples or ())
+    rows, cols = [], []
+    for category_index in card_index.values():
+        for card, posting in category_index.items():
+            # A card played by a single commander can't connect anyone
+            if card in staples or len(posting) < 2 or (cards is not None and card not in cards):
+                continue
+            rows.append(np.asarray(posting, dtype=np.int64))
+            cols.append(np.full(len(posting), len(cols), dtype=np.int64))
+    num_postings = len(cols)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n, num_postings))
+
+
+def iter_candidate_rows(postings, start=0, stop=None, block_size=512):
+    """
+    Yield (i, js, shared) for every row i in [start, stop), in order: the
+    sorted j > i that share at least one posting with i, and how many
+    postings each pair shares. P @ P.T is taken one block of rows at a time,
+    so memory stays at one block's candidates however many pairs there are.
+    """
+    n = postings.shape[0]
+    stop = n if stop is None else stop
+    transposed = postings.T.tocsc()
+    for block_start in range(start, stop, block_size):
+        block = (postings[block_start:min(block_start + block_size, stop)] @ transposed).tocsr()
+        block.sort_indices()
+        for row in range(block.shape[0]):
+            i = block_start + row
+            js = block.indices[block.indptr[row]:block.indptr[row + 1]]
+            shared = block.data[block.indptr[row]:block.indptr[row + 1]]
+            upper = js > i
+            yield i, js[upper].tolist(), shared[upper].tolist()
+
+
+def count_candidate_pairs(postings, block_size=512):
+    """Number of candidate pairs in each row, without keeping the pairs themselves."""
+    counts = np.zeros(postings.shape[0], dtype=np.int64)
+    for i, js, _ in iter_candidate_rows(postings, block_size=block_size):
+        counts[i] = len(js)
+    return counts
+
+
+def generate_candidate_pairs(card_index, n, staples=None, block_size=512):
+    """
+    Generate only the commander pairs that share at least one card, as
+    (i, js, shared) rows from iter_candidate_rows over every row. Pairs that
+    share nothing are never produced, since they can't have a positive
+    composite score.
+    """
+    return iter_candidate_rows(build_posting_matrix(card_index, n, staples), block_size=block_size)
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+from collections import OrderedDict
+
+from .commander_store import CommanderData
+from .stages import project_commander
+
+SHARD_INDEX = 'index.json'
+SHARD_VERSION = 1
+DEFAULT_SHARD_SIZE = 256  # Commanders per shard file
+RECORD_CACHE_SIZE = 64    # Deserialized card_groups kept around per mapping
+
+
+def write_commander_shards(commander_data, shard_dir, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Write commander data as a sharded dataset:
+
+    - shard-NNNN.ndjson: one minified card_groups record per line, shard_size
+      commanders per file
+    - index.json: per commander, every other field (deck_count, rank,
+      color_identity, tribes, ...), the card count of each group, and where
+      its record lives (shard, byte offset, length)
+
+    The index is written last, so a half-written dataset is never picked up.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    index = {}
+    shard = None
+    written = 0
+    try:
+        for commander, data in commander_data.items():
+            if not data:
+                index[commander] = {'data': data}
+                continue
+            if written % shard_size == 0:
+                if shard:
+                    shard.close()
+                shard_name = f"shard-{written // shard_size:04d}.ndjson"
+                shard = open(os.path.join(shard_dir, shard_name), 'wb')
+            card_groups = data.get('card_groups') or {}
+            record = json.dumps(card_groups, separators=(',', ':')).encode('utf-8') + b'\n'
+            index[commander] = {
+                'data': {key: value for key, value in data.items() if key != 'card_groups'},
+                'card_counts': {group: len(cards) for group, cards in card_groups.items()},
+                'shard': shard_name,
+                'offset': shard.tell(),
+                'length': len(record)
+            }
+            shard.write(record)
+            written += 1
+    finally:
+        if shard:
+            shard.close()
+
+    tmp_path = os.path.join(shard_dir, SHARD_INDEX + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': SHARD_VERSION, 'commanders': index}, f, separators=(',', ':'))
+    os.replace(tmp_path, os.path.join(shard_dir, SHARD_INDEX))
+    print(f"Wrote {len(index)} commanders to {shard_dir}")
+
+
+def is_shard_dir(path):
+    return os.path.isfile(os.path.join(path, SHARD_INDEX))
+
+
+class ShardedCommanderData(CommanderData):
+    """
+    Lazily loaded view of a sharded commander dataset.
+
+    Only the index is read up front. Looking up a commander deserializes its
+    card_groups record from its shard and returns the same dict shape as
+    extracted_commander_data.json; a small LRU keeps the most recent ones.
+    node_record and card_counts answer from the index alone, so stages that
+    only need node fields (process_nodes, tribes, color identities) never
+    read a card list. Stages that do need cards make single passes over the
+    commanders, so only one shard record is decoded at a time; the per-pair
+    engines need random access to every card list and intern them into a
+    CommanderStore first (see prepare_viz_data).
+
+    With fields (see stages.fields_for_stages), node fields are projected
+    when the index is loaded and card entries as records are read; card lists
+    aren't read at all if no enabled stage uses card_groups.
+    """
+
+    def __init__(self, shard_dir, cache_size=RECORD_CACHE_SIZE, fields=None):
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, SHARD_INDEX), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != SHARD_VERSION:
+            raise ValueError(f"Unsupported commander shard version in {shard_dir}: {index.get('version')}")
+        self._index = index['commanders']
+        self._fields = fields
+        if fields is not None:
+            for entry in self._index.values():
+                entry['data'] = project_commander(entry['data'], fields['commander'], fields['card'])
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def node_record(self, commander):
+        """Everything but card_groups, straight from the index."""
+        return self._index[commander]['data']
+
+    def card_counts(self, commander):
+        """Group name -> number of cards, straight from the index."""
+        return self._index[commander].get('card_counts', {})
+
+    def _read_card_groups(self, entry):
+        with open(os.path.join(self.shard_dir, entry['shard']), 'rb') as f:
+            f.seek(entry['offset'])
+            return json.loads(f.read(entry['length']))
+
+    def __getitem__(self, commander):
+        entry = self._index[commander]
+        if not entry['data']:
+            return entry['data']
+        data = self._cache.get(commander)
+        if data is None:
+            if self._fields is None:
+                data = dict(entry['data'], card_groups=self._read_card_groups(entry))
+            elif 'card_groups' in self._fields['commander']:
+                card_groups = self._read_card_groups(entry)
+                data = dict(entry['data'], card_groups=project_commander(
+                    {'card_groups': card_groups}, {'card_groups'}, self._fields['card'])['card_groups'])
+            else:
+                data = entry['data']
+            self._cache[commander] = data
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(commander)
+        return data
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, commander):
+        return commander in self._index
+
+
+def main(argv=None):
+    """Convert a commander data JSON file into a sharded dataset."""
+    parser = argparse.ArgumentParser(description="Shard commander data for lazy loading")
+    parser.add_argument('--commander-data', default='../data/extracted_commander_data.json',
+                        help="Commander data file, relative to the scripts directory")
+    parser.add_argument('--out', default='../data/commander_shards',
+                        help="Output directory, relative to the scripts directory")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f"Commanders per shard file (default: {DEFAULT_SHARD_SIZE})")
+    args = parser.parse_args(argv)
+
+    from .data_loaders import SCRIPTS_DIR, load_commander_data
+    write_commander_shards(load_commander_data(args.commander_data),
+                           os.path.join(SCRIPTS_DIR, args.out), args.shard_size)
+
+if __name__ == "__main__":
+    main()
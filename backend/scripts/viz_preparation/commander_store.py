@@ -0,0 +1,161 @@
+from array import array
+from collections.abc import Mapping
+import sys
+
+
+class CommanderData(Mapping):
+    """
+    Commander data in the extracted_commander_data.json layout: a Mapping of
+    commander -> data dict, with card_groups as lists of card dicts.
+
+    This is the interface every stage reads commander data through.
+    load_commander_data wraps plain JSON in it, and CommanderStore and
+    ShardedCommanderData implement the same methods over their own layouts.
+    Card keys (card_ids) are whatever is cheapest to compare: card names here,
+    integer IDs in a CommanderStore. card_name turns a key back into a name
+    and frequencies_by_id re-keys card frequencies to match.
+    """
+
+    def __init__(self, records):
+        self._records = records
+
+    def __getitem__(self, commander):
+        return self._records[commander]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, commander):
+        return commander in self._records
+
+    def _card_lists(self, commander):
+        return (self[commander] or {}).get('card_groups') or {}
+
+    def node_record(self, commander):
+        """A commander's data for stages that don't need card lists."""
+        return self[commander]
+
+    def card_groups(self, commander):
+        """Group name -> card keys for one commander."""
+        return {group: [card['name'] for card in cards] for group, cards in self._card_lists(commander).items()}
+
+    def card_ids(self, commander, group):
+        return self.card_names_in(commander, group)
+
+    def card_names_in(self, commander, group):
+        return [card['name'] for card in self._card_lists(commander).get(group, [])]
+
+    def card_name(self, card_id):
+        return card_id
+
+    def card_counts(self, commander):
+        """Group name -> number of cards, from the projected counts when card lists weren't kept."""
+        data = self[commander] or {}
+        if 'card_groups' not in data and 'card_counts' in data:
+            return data['card_counts']
+        return {group: len(cards) for group, cards in self._card_lists(commander).items()}
+
+    def referenced_card_names(self):
+        """Every card name in any commander's card groups, plus the commanders themselves."""
+        names = {
+            card['name']
+            for commander in self
+            for cards in self._card_lists(commander).values()
+            for card in cards
+        }
+        names.update(self)
+        return names
+
+    def frequencies_by_id(self, card_frequencies):
+        """Card frequencies keyed the same way as card_ids."""
+        return card_frequencies
+
+
+def as_commander_data(commander_data):
+    """Wrap a plain commander -> data dict in CommanderData. Anything that already is one is returned as-is."""
+    if isinstance(commander_data, CommanderData):
+        return commander_data
+    return CommanderData(commander_data)
+
+
+class CommanderStore(CommanderData):
+    """
+    Compact, read-only view of the commander data.
+
+    Card names are interned once into integer IDs and each commander's card
+    groups are held as sorted array('i') of IDs instead of lists of per-card
+    dicts. Everything else (deck_count, rank, color_identity, tribes, ...) is
+    kept as-is. Records don't have a 'card_groups' key; cards are read
+    through the CommanderData methods, which this overrides.
+    """
+
+    def __init__(self, records, card_groups, card_names):
+        super().__init__(records)        # commander -> data dict without card_groups (or None)
+        self._card_groups = card_groups  # commander -> {group: array('i') of sorted card IDs}
+        self.card_names = card_names     # card ID -> card name
+        self._frequency_cache = None
+
+    @classmethod
+    def from_commander_data(cls, commander_data):
+        card_ids = {}
+        card_names = []
+        records = {}
+        card_groups = {}
+        for commander, data in commander_data.items():
+            if not data:
+                records[commander] = data
+                continue
+            records[commander] = {key: value for key, value in data.items() if key != 'card_groups'}
+            groups = {}
+            for group, cards in (data.get('card_groups') or {}).items():
+                ids = []
+                for card in cards:
+                    name = card['name']
+                    card_id = card_ids.get(name)
+                    if card_id is None:
+                        card_id = card_ids[name] = len(card_names)
+                        card_names.append(sys.intern(name))
+                    ids.append(card_id)
+                groups[group] = array('i', sorted(ids))
+            card_groups[commander] = groups
+        return cls(records, card_groups, card_names)
+
+    def card_groups(self, commander):
+        """Group name -> sorted card ID array for one commander."""
+        return self._card_groups.get(commander, {})
+
+    def card_ids(self, commander, group):
+        return self._card_groups.get(commander, {}).get(group, array('i'))
+
+    def card_names_in(self, commander, group):
+        names = self.card_names
+        return [names[card_id] for card_id in self.card_ids(commander, group)]
+
+    def card_name(self, card_id):
+        return self.card_names[card_id]
+
+    def card_counts(self, commander):
+        return {group: len(ids) for group, ids in self.card_groups(commander).items()}
+
+    def referenced_card_names(self):
+        names = set(self.card_names)
+        names.update(self)
+        return names
+
+    def frequencies_by_id(self, card_frequencies):
+        """
+        Re-key a card name -> frequency dict by card ID. The result is cached
+        for the last dict passed in, so hot loops can call this per pair.
+        """
+        cached = self._frequency_cache
+        if cached is None or cached[0] is not card_frequencies:
+            by_id = {
+                card_id: card_frequencies[name]
+                for card_id, name in enumerate(self.card_names)
+                if name in card_frequencies
+            }
+            cached = self._frequency_cache = (card_frequencies, by_id)
+        return cached[1]
@@ -1,77 +1,342 @@
 import json
 import os
+import queue
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .artifacts import BROTLI_QUALITY, publish_artifacts
+from .commander_shards import ShardedCommanderData, is_shard_dir
+from .commander_store import CommanderData
+from .graph_bundle import GraphBundleWriter
+from .metadata_index import build_card_metadata_index, open_card_metadata_index
+from .stages import project_commander, project_entries, project_metadata
 
 # Get the path to the scripts directory (parent of viz_preparation)
 SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def load_commander_data(filepath='extracted_commander_data.json'):
-    """Load commander data from JSON file."""
+# Scryfall default-cards bulk dump, one card object per line
+DEFAULT_CARD_DUMP = 'default-cards-20241223222017.json'
+NAME_PATTERN = re.compile(r'"name"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+def load_commander_data(filepath='extracted_commander_data.json', fields=None):
+    """
+    Load commander data from JSON file, wrapped in CommanderData. A directory
+    written by write_commander_shards is opened lazily instead (see
+    commander_shards).
+
+    Pass fields from stages.fields_for_stages to keep only the commander and
+    card fields the enabled stages read.
+    """
     print("Loading commander data...")
     full_path = os.path.join(SCRIPTS_DIR, filepath)
+    if is_shard_dir(full_path):
+        return ShardedCommanderData(full_path, fields=fields)
     with open(full_path, 'r') as f:
-        return json.load(f)
+        commander_data = json.load(f)
+    if fields is None:
+        return CommanderData(commander_data)
+
+    project_entries(commander_data, lambda data: project_commander(data, fields['commander'], fields['card']),
+                    "Commander data")
+    return CommanderData(commander_data)
 
-def load_card_metadata():
+def _card_entry(card):
+    return {
+        'color_identity': card['color_identity'],
+        'rarity': card.get('rarity', 'common'),
+        'image_uris': {
+            'small': card.get('image_uris', {}).get('small'),
+            'normal': card.get('image_uris', {}).get('normal')
+        },
+        'edhrec_rank': card.get('edhrec_rank'),
+        'type_line': card.get('type_line')
+    }
+
+def _line_card_name(line):
+    """
+    Pull the card name out of a dump line without parsing the whole line.
+    The top-level "name" is the first one in Scryfall card objects (card_faces
+    and all_parts come later). Returns None if the line has no name.
+    """
+    match = NAME_PATTERN.search(line)
+    if not match:
+        return None
+    name = match.group(1)
+    if '\\' in name:
+        name = json.loads(f'"{name}"')
+    return name
+
+def load_card_metadata(metadata_path=DEFAULT_CARD_DUMP, card_names=None, use_index=False, workers=1, fields=None):
     """
     Load color identity and additional metadata from Scryfall data.
     Now includes: color identity, rarity, release date (earliest from all printings), 
     image URIs, EDHREC data, and type line.
+
+    Pass card_names (see get_referenced_card_names) to only load those cards:
+    each line's name is checked with a regex first and only lines for
+    referenced cards get a full json.loads. Without it every card is loaded.
+
+    With use_index, every card is compiled once into a SQLite index next to
+    the dump (see metadata_index) and a lazy Mapping over it is returned
+    instead; card_names isn't needed then. The index is rebuilt whenever the
+    dump's path, size or mtime changes.
+
+    workers > 1 parses the dump in a process pool (see _parse_card_dump).
+    Pass fields from stages.fields_for_stages to keep only the metadata
+    fields the enabled stages read.
     """
-    card_metadata = {}
-    # Dictionary to track all release dates for each unique card
-    release_dates_by_card = {}
+    metadata_fields = fields['metadata'] if fields is not None else None
+    if metadata_fields is not None and not metadata_fields:
+        print("No enabled stage reads card metadata, skipping the card dump")
+        return {}
     print("Loading card metadata...")
-    metadata_path = os.path.join(SCRIPTS_DIR, 'default-cards-20241223222017.json')
-    
-    with open(metadata_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            try:
-                card = json.loads(line.strip().rstrip(','))
-                card_name = card['name']
-                
-                # Track release date for this printing
-                if card.get('released_at'):
-                    if card_name not in release_dates_by_card:
-                        release_dates_by_card[card_name] = []
-                    release_dates_by_card[card_name].append(card['released_at'])
-
-                # Only create/update metadata if we don't have it yet
-                # or if current version has better image data
-                if card_name not in card_metadata or (
-                    not card_metadata[card_name]['image_uris']['normal'] and 
-                    card.get('image_uris', {}).get('normal')
-                ):
-                    card_metadata[card_name] = {
-                        'color_identity': card['color_identity'],
-                        'rarity': card.get('rarity', 'common'),
-                        'image_uris': {
-                            'small': card.get('image_uris', {}).get('small'),
-                            'normal': card.get('image_uris', {}).get('normal')
-                        },
-                        'edhrec_rank': card.get('edhrec_rank'),
-                        'type_line': card.get('type_line')
-                    }
-            except json.JSONDecodeError:
+    full_path = os.path.join(SCRIPTS_DIR, metadata_path)
+    if not use_index:
+        card_metadata = _parse_card_dump(full_path, card_names, workers)
+        if metadata_fields is None:
+            return card_metadata
+        return project_entries(card_metadata, lambda card: project_metadata(card, metadata_fields), "Card metadata")
+
+    index = open_card_metadata_index(full_path, fields=metadata_fields)
+    if index is None:
+        print("Card metadata index is missing or stale, rebuilding...")
+        build_card_metadata_index(full_path, _parse_card_dump(full_path, workers=workers))
+        index = open_card_metadata_index(full_path, fields=metadata_fields)
+    return index
+
+def _parse_card_lines(lines, card_names=None):
+    """
+    Parse dump lines into (card_metadata, earliest_release) without the
+    release dates applied yet, so results for consecutive chunks can be merged.
+    """
+    card_metadata = {}
+    # Earliest release date seen so far for each card
+    earliest_release = {}
+
+    for line in lines:
+        if card_names is not None:
+            name = _line_card_name(line)
+            if name is None or name not in card_names:
                 continue
+        try:
+            card = json.loads(line.strip().rstrip(','))
+            card_name = card['name']
+            
+            # Track release date for this printing
+            released_at = card.get('released_at')
+            if released_at and (card_name not in earliest_release or released_at < earliest_release[card_name]):
+                earliest_release[card_name] = released_at
+
+            # Only create/update metadata if we don't have it yet
+            # or if current version has better image data
+            if card_name not in card_metadata or (
+                not card_metadata[card_name]['image_uris']['normal'] and 
+                card.get('image_uris', {}).get('normal')
+            ):
+                card_metadata[card_name] = _card_entry(card)
+        except json.JSONDecodeError:
+            continue
+
+    return card_metadata, earliest_release
+
+def split_line_ranges(filepath, num_chunks):
+    """
+    Split a file into about num_chunks (start, stop) byte ranges. Every
+    boundary is moved forward to just after a newline, so no line is split.
+    """
+    size = os.path.getsize(filepath)
+    bounds = [0]
+    with open(filepath, 'rb') as f:
+        for k in range(1, num_chunks):
+            f.seek(max(size * k // num_chunks, bounds[-1]))
+            f.readline()
+            if f.tell() >= size:
+                break
+            if f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+def _parse_card_range(full_path, card_names, byte_range):
+    """Parse the lines in one byte range of the dump (run in a worker process)."""
+    start, stop = byte_range
+
+    def lines():
+        with open(full_path, 'rb') as f:
+            f.seek(start)
+            position = start
+            while position < stop:
+                line = f.readline()
+                if not line:
+                    break
+                position += len(line)
+                yield line.decode('utf-8')
+
+    return _parse_card_lines(lines(), card_names)
+
+def _parse_card_dump(full_path, card_names=None, workers=1, chunks_per_worker=4):
+    """
+    Parse the dump serially, or with workers > 1 in a process pool over
+    line-aligned byte ranges. Chunk results are merged in file order with the
+    same rules as the serial loop (keep the first printing unless it has no
+    image and a later one does, earliest release date wins), so both paths
+    give identical metadata.
+    """
+    if workers > 1:
+        ranges = split_line_ranges(full_path, workers * chunks_per_worker)
+        print(f"Parsing card dump in {len(ranges)} chunks with {workers} workers...")
+        card_metadata = {}
+        earliest_release = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parse = partial(_parse_card_range, full_path, card_names)
+            for chunk_metadata, chunk_release in executor.map(parse, ranges):
+                for card_name, card in chunk_metadata.items():
+                    if card_name not in card_metadata or (
+                        not card_metadata[card_name]['image_uris']['normal'] and
+                        card['image_uris']['normal']
+                    ):
+                        card_metadata[card_name] = card
+                for card_name, released_at in chunk_release.items():
+                    if card_name not in earliest_release or released_at < earliest_release[card_name]:
+                        earliest_release[card_name] = released_at
+    else:
+        with open(full_path, 'r', encoding='utf-8') as f:
+            card_metadata, earliest_release = _parse_card_lines(f, card_names)
 
     # Set the earliest release date for each card
-    for card_name, dates in release_dates_by_card.items():
-        if card_name in card_metadata and dates:
-            card_metadata[card_name]['released_at'] = min(dates)
+    for card_name, released_at in earliest_release.items():
+        if card_name in card_metadata:
+            card_metadata[card_name]['released_at'] = released_at
 
+    if card_names is not None:
+        print(f"Loaded metadata for {len(card_metadata)} of {len(card_names)} referenced cards")
     return card_metadata
 
-def save_results(nodes, edges, output_dir='viz_data'):
-    """Save processed nodes and edges to JSON files."""
+# Edge output formats and the file each one writes to
+EDGE_FORMATS = {
+    'pretty': 'edges.json',   # Same bytes as json.dump(edges, f, indent=2)
+    'json': 'edges.json',     # Minified JSON array
+    'ndjson': 'edges.ndjson'  # One minified edge per line
+}
+
+def _encode_edges(batch, edge_format, first):
+    """Encode a batch of edges as one string, with the separator before each edge."""
+    if edge_format == 'pretty':
+        items = [json.dumps(edge, indent=2).replace('\n', '\n  ') for edge in batch]
+        return ('\n  ' if first else ',\n  ') + ',\n  '.join(items)
+    items = [json.dumps(edge, separators=(',', ':')) for edge in batch]
+    if edge_format == 'ndjson':
+        return ''.join(item + '\n' for item in items)
+    return ('' if first else ',') + ','.join(items)
+
+def write_edges(edges, filepath, edge_format='pretty', batch_size=256, queue_size=64):
+    """
+    Stream edges from any iterable to a file without holding them all.
+
+    Edges are handed to a writer thread in batches through a bounded queue,
+    so encoding and disk writes overlap with edge computation while at most
+    queue_size batches are in flight. Returns the number of edges written.
+
+    The file is written to a temporary path and only replaces filepath once
+    both the edge iterable and the writer have finished cleanly; an error on
+    either side is raised and the previous file is left alone.
+    """
+    if edge_format not in EDGE_FORMATS:
+        raise ValueError(f"Unknown edge format: {edge_format}")
+
+    tmp_path = filepath + '.tmp'
+    batches = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    def writer():
+        finished = False
+        try:
+            with open(tmp_path, 'w') as f:
+                first = True
+                while True:
+                    batch = batches.get()
+                    if batch is None:
+                        finished = True
+                        break
+                    if first and edge_format != 'ndjson':
+                        f.write('[')
+                    f.write(_encode_edges(batch, edge_format, first))
+                    first = False
+                if edge_format != 'ndjson':
+                    f.write('[]' if first else ('\n]' if edge_format == 'pretty' else ']'))
+        except Exception as e:
+            errors.append(e)
+            # Keep draining after a failure so the producer never blocks
+            while not finished:
+                finished = batches.get() is None
+
+    thread = threading.Thread(target=writer, name='edge-writer', daemon=True)
+    thread.start()
+    count = 0
+    batch = []
+    completed = False
+    try:
+        for edge in edges:
+            batch.append(edge)
+            if len(batch) >= batch_size:
+                batches.put(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            batches.put(batch)
+            count += len(batch)
+        completed = True
+    finally:
+        batches.put(None)
+        thread.join()
+        if not completed or errors:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    if errors:
+        raise errors[0]
+    os.replace(tmp_path, filepath)
+    return count
+
+def save_results(nodes, edges, output_dir='viz_data', edge_format='pretty', bundle_file='graph.bin',
+                 publish=True, brotli_quality=BROTLI_QUALITY):
+    """
+    Save processed nodes and edges. Edges can be any iterable, including a
+    generator straight from the edge engine; see write_edges for the formats.
+
+    The same stream also goes into a columnar binary bundle (see graph_bundle)
+    unless bundle_file is None. With publish, content-hashed and precompressed
+    copies of every output are written next to them with a manifest.json
+    (see artifacts), brotli ones at brotli_quality.
+    """
     # Create viz_data directory in the scripts folder
     output_path = os.path.join(SCRIPTS_DIR, output_dir)
     os.makedirs(output_path, exist_ok=True)
     
     print("\nSaving processed data...")
-    with open(os.path.join(output_path, 'nodes.json'), 'w') as f:
+    # Nodes only replace nodes.json once the edge stream has been written too,
+    # so an engine failing partway leaves both previous files in place
+    nodes_path = os.path.join(output_path, 'nodes.json')
+    nodes_tmp_path = nodes_path + '.tmp'
+    with open(nodes_tmp_path, 'w') as f:
         json.dump(nodes, f, indent=2)
-    with open(os.path.join(output_path, 'edges.json'), 'w') as f:
-        json.dump(edges, f, indent=2)
-      # json.dump(edges, f, separators=(',', ':'))  # Remove whitespace
+    edges_file = EDGE_FORMATS[edge_format]
+    bundle = GraphBundleWriter(nodes) if bundle_file else None
+    if bundle:
+        edges = bundle.track(edges)
+    try:
+        count = write_edges(edges, os.path.join(output_path, edges_file), edge_format)
+    except BaseException:
+        os.remove(nodes_tmp_path)
+        raise
+    os.replace(nodes_tmp_path, nodes_path)
+    if bundle:
+        bundle.write(os.path.join(output_path, bundle_file))
+        print(f"Wrote graph bundle to {output_dir}/{bundle_file}")
+    if publish:
+        print("Publishing hashed artifacts...")
+        publish_artifacts(output_path, ['nodes.json', edges_file] + ([bundle_file] if bundle_file else []),
+                          brotli_quality)
 
-    print("Done! Data saved to viz_data/nodes.json and viz_data/edges.json")
\ No newline at end of file
+    print(f"Done! Data saved to {output_dir}/nodes.json and {output_dir}/{edges_file} ({count} edges)")
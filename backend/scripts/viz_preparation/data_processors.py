@@ -1,12 +1,18 @@
-from .utils import CARD_CATEGORIES, DEBUG_PAIRS, get_cards_from_category, print_processing_progress
-from .weight_calculators.overlap import calculate_normalized_overlap, normalize_raw_weight
+from .card_index import build_card_index, generate_candidate_pairs
+from .utils import (CARD_CATEGORIES, DEBUG_PAIRS, get_card_counts, get_card_ids_from_category,
+                    get_card_key_frequencies, get_cards_from_category, get_commander_record,
+                    print_processing_progress)
+from .weight_calculators.overlap import build_color_fit_tables, calculate_normalized_overlap, normalize_raw_weight
 from .weight_calculators.uniqueness import calculate_uniqueness_weight
-from .weight_calculators.tribes import calculate_tribes_weight, calculate_tribes_simplified_weight
+from .weight_calculators.tribes import (SIMPLIFIED_POSITION_DECAY, SIMPLIFIED_TOP_N, calculate_tribes_weight,
+                                        calculate_tribes_simplified_weight)
 
 def process_nodes(commander_data, card_metadata):  # Added card_metadata parameter
     nodes = []
     print("Processing nodes...")
-    for commander, data in commander_data.items():
+    for commander in commander_data:
+        # Node fields only; sharded data serves these without loading card lists
+        data = get_commander_record(commander_data, commander)
         if data:  # Skip empty entries
             # Get metadata for this commander
             cmd_metadata = card_metadata.get(commander, {})
@@ -31,10 +37,7 @@ def process_nodes(commander_data, card_metadata):  # Added card_metadata paramet
                 "deck_count": data['deck_count'],
                 "rank": data['rank'],
                 "colors": data['color_identity'],
-                "card_counts": {
-                    category: len(get_cards_from_category(commander_data, commander, category))
-                    for category in CARD_CATEGORIES
-                },
+                "card_counts": get_card_counts(commander_data, commander),
                 # Add new metadata fields
                 "released_at": cmd_metadata.get('released_at'),
                 "image_uris": {
@@ -51,11 +54,133 @@ def process_nodes(commander_data, card_metadata):  # Added card_metadata paramet
     print(f"Processed {len(nodes)} nodes")
     return nodes
 
-def process_edges(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes, debug=False):
+def stream_edges(edges, sparsifier=None):
+    """
+    Pass an edge stream through an optional sparsifier (see sparsification)
+    and print the count once it's drained. Nothing is collected here, so
+    memory doesn't grow with the edge count beyond what the sparsifier holds.
+    """
+    count = 0
+    if sparsifier:
+        for edge in edges:
+            sparsifier.add(edge)
+        for edge in sparsifier.edges():
+            count += 1
+            yield edge
+        print(f"\nProcessed {sparsifier.seen} edges, kept {count} after sparsification")
+    else:
+        for edge in edges:
+            count += 1
+            yield edge
+        print(f"\nProcessed {count} edges")
+
+def score_commander_pair(cmd1, cmd2, i, j, commander_data, card_metadata, card_frequencies, normalized_tribes,
+                         fit_tables):
+    """
+    Calculate all weight metrics for one commander pair.
+    i and j are the commanders' rows in fit_tables.
+    Returns the edge dict, or None if the pair has no meaningful overlap.
+    """
+    # Debug specific commander pairs
+    if (cmd1, cmd2) in DEBUG_PAIRS or (cmd2, cmd1) in DEBUG_PAIRS:
+        print(f"\nAnalyzing uniqueness between {cmd1} and {cmd2}")
+        for category in CARD_CATEGORIES:
+            cards1 = get_cards_from_category(commander_data, cmd1, category)
+            cards2 = get_cards_from_category(commander_data, cmd2, category)
+            print(f"\nCategory: {category}")
+            uniqueness_score = calculate_uniqueness_weight(cards1, cards2, card_frequencies, debug=True)
+
+    if not (get_commander_record(commander_data, cmd1) and get_commander_record(commander_data, cmd2)):
+        return None
+
+    normalized_overlaps = {}
+    raw_overlaps = {}
+    uniqueness_scores = {}
+
+    # Card keys are integer IDs when commander_data is a CommanderStore
+    key_frequencies = get_card_key_frequencies(commander_data, card_frequencies)
+
+    # Calculate maximum possible overlap for raw weight normalization
+    total_cards1 = sum(len(get_card_ids_from_category(commander_data, cmd1, cat)) 
+                    for cat in CARD_CATEGORIES)
+    total_cards2 = sum(len(get_card_ids_from_category(commander_data, cmd2, cat)) 
+                    for cat in CARD_CATEGORIES)
+    max_possible_overlap = min(total_cards1, total_cards2)
+
+    # Process each category separately
+    for category in CARD_CATEGORIES:
+        cards1 = get_card_ids_from_category(commander_data, cmd1, category)
+        cards2 = get_card_ids_from_category(commander_data, cmd2, category)
+
+        # Keep track of different overlap metrics
+        raw_overlap = len(set(cards1).intersection(cards2))
+        normalized_overlap = calculate_normalized_overlap(
+            cmd1, cmd2, cards1, cards2, commander_data, card_metadata,
+            fit_tables=(fit_tables[category][i], fit_tables[category][j])
+        )
+        uniqueness_score = calculate_uniqueness_weight(cards1, cards2, key_frequencies)
+
+        raw_overlaps[category] = raw_overlap
+        normalized_overlaps[category] = normalized_overlap
+        uniqueness_scores[category] = uniqueness_score
+
+    # Calculate final weights
+    tribes_weight = calculate_tribes_weight(cmd1, cmd2, normalized_tribes)
+    total_raw_overlap = sum(raw_overlaps.values())
+    normalized_raw_weight = normalize_raw_weight(total_raw_overlap, max_possible_overlap)
+    total_normalized_overlap = sum(normalized_overlaps.values()) / len(CARD_CATEGORIES)
+    avg_uniqueness = sum(uniqueness_scores.values()) / len(CARD_CATEGORIES)
+
+    # Simplified tribes weight calculation
+    tribes_simplified_weight = calculate_tribes_simplified_weight(
+        cmd1, 
+        cmd2, 
+        normalized_tribes,
+        top_n=SIMPLIFIED_TOP_N,          # Configurable: number of top tribes to consider
+        position_decay=SIMPLIFIED_POSITION_DECAY,  # Configurable: how quickly position importance decays
+        debug=(cmd1, cmd2) in DEBUG_PAIRS  # Debug for specific pairs
+    )
+
+    # Calculate composite score (blend of normalized overlap and uniqueness)
+    composite_score = (total_normalized_overlap * 0.5) + (avg_uniqueness * 0.5)
+
+    # Only create edge if there's meaningful overlap
+    if composite_score <= 0:
+        return None
+
+    return {
+        "source": cmd1,
+        "target": cmd2,
+        "raw_weight": round(normalized_raw_weight, 3),
+        "normalized_weight": round(total_normalized_overlap, 3),
+        "uniqueness_weight": round(avg_uniqueness, 3),
+        "tribes_weight": round(tribes_weight, 3),
+        "tribes_simplified_weight": round(tribes_simplified_weight, 3),
+        "composite_weight": round(composite_score, 3),
+        # "raw_overlaps": raw_overlaps,
+        # "normalized_overlaps": normalized_overlaps,
+        # "uniqueness_scores": uniqueness_scores
+    }
+
+def process_edges(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes, debug=False,
+                  staples=None, sparsifier=None):
     """
     Process relationships between commanders into edges for visualization.
     Calculates various weight metrics for each relationship.
+
+    Only pairs that share at least one card are scored (see card_index).
+    Pass staples to also skip pairs whose only shared cards are staples.
+    Pass a sparsifier (see sparsification) to filter edges as they're
+    produced instead of keeping every pair with a positive score.
+
+    Returns the full edge list; use iter_edges to stream instead.
     """
+    edges = iter_edges(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes, debug, staples)
+    return list(stream_edges(edges, sparsifier))
+
+def iter_edges(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes, debug=False,
+               staples=None):
+    """Generator version of process_edges: yields each edge as soon as it's scored."""
     print("Processing edges...")
 
     # Debug: Print some example card frequencies
@@ -67,88 +192,23 @@ def process_edges(commander_data, nodes, card_metadata, card_frequencies, normal
 
 
     commanders = [n['id'] for n in nodes]
-    edge_data = []
+
+    # Color fit counts per commander and category, so each pair's possible
+    # overlap is a table lookup instead of a scan over both card lists
+    _, fit_tables = build_color_fit_tables(commander_data, commanders, card_metadata)
+
+    # Candidate pairs from the card -> commanders index; pairs sharing no
+    # cards would score zero on every metric, so they're never visited
+    card_index = build_card_index(commander_data, commanders)
     
     # Compare each pair of commanders
-    for i in range(len(commanders)):
+    for i, candidates, _ in generate_candidate_pairs(card_index, len(commanders), staples):
         print_processing_progress(i, len(commanders))
         
-        for j in range(i + 1, len(commanders)):
-            cmd1 = commanders[i]
-            cmd2 = commanders[j]
-            
-            # Debug specific commander pairs
-            if (cmd1, cmd2) in DEBUG_PAIRS or (cmd2, cmd1) in DEBUG_PAIRS:
-                print(f"\nAnalyzing uniqueness between {cmd1} and {cmd2}")
-                for category in CARD_CATEGORIES:
-                    cards1 = get_cards_from_category(commander_data, cmd1, category)
-                    cards2 = get_cards_from_category(commander_data, cmd2, category)
-                    print(f"\nCategory: {category}")
-                    uniqueness_score = calculate_uniqueness_weight(cards1, cards2, card_frequencies, debug=True)
-
-            if commander_data[cmd1] and commander_data[cmd2]:
-                normalized_overlaps = {}
-                raw_overlaps = {}
-                uniqueness_scores = {}
-                
-                # Calculate maximum possible overlap for raw weight normalization
-                total_cards1 = sum(len(get_cards_from_category(commander_data, cmd1, cat)) 
-                                for cat in CARD_CATEGORIES)
-                total_cards2 = sum(len(get_cards_from_category(commander_data, cmd2, cat)) 
-                                for cat in CARD_CATEGORIES)
-                max_possible_overlap = min(total_cards1, total_cards2)
-
-                # Process each category separately
-                for category in CARD_CATEGORIES:
-                    cards1 = get_cards_from_category(commander_data, cmd1, category)
-                    cards2 = get_cards_from_category(commander_data, cmd2, category)
-                    
-                    # Keep track of different overlap metrics
-                    raw_overlap = len(set(cards1).intersection(cards2))
-                    normalized_overlap = calculate_normalized_overlap(
-                        cmd1, cmd2, cards1, cards2, commander_data, card_metadata
-                    )
-                    uniqueness_score = calculate_uniqueness_weight(cards1, cards2, card_frequencies)
-                    
-                    raw_overlaps[category] = raw_overlap
-                    normalized_overlaps[category] = normalized_overlap
-                    uniqueness_scores[category] = uniqueness_score
-
-                # Calculate final weights
-                tribes_weight = calculate_tribes_weight(cmd1, cmd2, normalized_tribes)
-                total_raw_overlap = sum(raw_overlaps.values())
-                normalized_raw_weight = normalize_raw_weight(total_raw_overlap, max_possible_overlap)
-                total_normalized_overlap = sum(normalized_overlaps.values()) / len(CARD_CATEGORIES)
-                avg_uniqueness = sum(uniqueness_scores.values()) / len(CARD_CATEGORIES)
-                
-                # Simplified tribes weight calculation
-                tribes_simplified_weight = calculate_tribes_simplified_weight(
-                    cmd1, 
-                    cmd2, 
-                    normalized_tribes,
-                    top_n=3,          # Configurable: number of top tribes to consider
-                    position_decay=0.85,  # Configurable: how quickly position importance decays
-                    debug=(cmd1, cmd2) in DEBUG_PAIRS  # Debug for specific pairs
-                )
-
-                # Calculate composite score (blend of normalized overlap and uniqueness)
-                composite_score = (total_normalized_overlap * 0.5) + (avg_uniqueness * 0.5)
-
-                # Only create edge if there's meaningful overlap
-                if composite_score > 0:
-                    edge_data.append({
-                        "source": cmd1,
-                        "target": cmd2,
-                        "raw_weight": round(normalized_raw_weight, 3),
-                        "normalized_weight": round(total_normalized_overlap, 3),
-                        "uniqueness_weight": round(avg_uniqueness, 3),
-                        "tribes_weight": round(tribes_weight, 3),
-                        "tribes_simplified_weight": round(tribes_simplified_weight, 3),
-                        "composite_weight": round(composite_score, 3),
-                        # "raw_overlaps": raw_overlaps,
-                        # "normalized_overlaps": normalized_overlaps,
-                        # "uniqueness_scores": uniqueness_scores
-                    })
-
-    print(f"\nProcessed {len(edge_data)} edges")
-    return edge_data
\ No newline at end of file
+        for j in candidates:
+            edge = score_commander_pair(
+                commanders[i], commanders[j], i, j,
+                commander_data, card_metadata, card_frequencies, normalized_tribes, fit_tables
+            )
+            if edge:
+                yield edge
\ No newline at end of file
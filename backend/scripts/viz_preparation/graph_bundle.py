@@ -0,0 +1,191 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from .sparsification import WEIGHT_METRICS
+
+# File layout (all integers little-endian):
+#   4 bytes   BUNDLE_MAGIC
+#   uint32    header length in bytes
+#   header    UTF-8 JSON, space-padded so the body starts on an 8-byte boundary
+#   body      sections at the header's offsets (relative to the body start),
+#             each 8-byte aligned so they can be viewed as typed arrays in place
+#
+# Sections:
+#   nodes            UTF-8 JSON list of node dicts (the node table)
+#   source, target   node indexes, uint16 when there are fewer than 65536 nodes, else uint32
+#   weights.<metric> uint16 fixed point, value = round(weight * weight_scale)
+BUNDLE_MAGIC = b'CGB1'
+BUNDLE_VERSION = 1
+WEIGHT_SCALE = 1000  # Weights are rounded to 3 decimals, so this is lossless
+ALIGNMENT = 8
+
+# Column values are buffered up to this many edges before going to the spool files
+SPOOL_CHUNK = 8192
+
+
+def _padding(length):
+    return -length % ALIGNMENT
+
+
+def _to_little_endian(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class GraphBundleWriter:
+    """
+    Build a columnar binary graph bundle from a stream of edges.
+
+    Edges are reduced to node indexes and fixed-point weights as they arrive
+    and spooled to one temporary file per column, so memory doesn't grow with
+    the edge count. write() assembles the header, node table and columns.
+    """
+
+    def __init__(self, nodes, metrics=WEIGHT_METRICS, weight_scale=WEIGHT_SCALE):
+        self.nodes = nodes
+        self.metrics = list(metrics)
+        self.weight_scale = weight_scale
+        self.edge_count = 0
+        self._node_index = {node['id']: i for i, node in enumerate(nodes)}
+        self._index_type, self.index_dtype = ('H', 'uint16') if len(nodes) <= 0xFFFF else ('I', 'uint32')
+        self._columns = {name: array(self._index_type) for name in ('source', 'target')}
+        self._columns.update((metric, array('H')) for metric in self.metrics)
+        self._spools = {name: tempfile.TemporaryFile() for name in self._columns}
+
+    def add(self, edge):
+        columns = self._columns
+        try:
+            columns['source'].append(self._node_index[edge['source']])
+            columns['target'].append(self._node_index[edge['target']])
+        except KeyError as e:
+            raise ValueError(f"Edge endpoint {e} is not in the node table") from None
+        for metric in self.metrics:
+            value = round(edge[metric] * self.weight_scale)
+            if not 0 <= value <= 0xFFFF:
+                raise ValueError(f"{metric} {edge[metric]} doesn't fit a uint16 at scale {self.weight_scale}")
+            columns[metric].append(value)
+        self.edge_count += 1
+        if len(columns['source']) >= SPOOL_CHUNK:
+            self._flush()
+
+    def track(self, edges):
+        """Pass edges through unchanged, adding each one to the bundle."""
+        for edge in edges:
+            self.add(edge)
+            yield edge
+
+    def _flush(self):
+        for name, values in self._columns.items():
+            _to_little_endian(values).tofile(self._spools[name])
+            del values[:]
+
+    def write(self, filepath):
+        self._flush()
+        node_table = json.dumps(self.nodes, separators=(',', ':')).encode('utf-8')
+
+        sections = {}
+        offset = 0
+
+        def place(name, length, **layout):
+            nonlocal offset
+            sections[name] = dict(offset=offset, length=length, **layout)
+            offset += length + _padding(length)
+
+        place('nodes', len(node_table), encoding='json')
+        index_size = array(self._index_type).itemsize
+        for name in ('source', 'target'):
+            place(name, self.edge_count * index_size, dtype=self.index_dtype)
+        for metric in self.metrics:
+            place(f'weights.{metric}', self.edge_count * 2, dtype='uint16')
+
+        header = json.dumps({
+            'version': BUNDLE_VERSION,
+            'node_count': len(self.nodes),
+            'edge_count': self.edge_count,
+            'weight_scale': self.weight_scale,
+            'metrics': self.metrics,
+            'sections': sections
+        }, separators=(',', ':')).encode('utf-8')
+        header += b' ' * _padding(len(BUNDLE_MAGIC) + 4 + len(header))
+
+        # Written under a temporary name and moved into place, so a crash never
+        # leaves a truncated bundle where the frontend will try to decode it
+        tmp_path = filepath + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(BUNDLE_MAGIC + struct.pack('<I', len(header)) + header)
+                f.write(node_table + b'\0' * _padding(len(node_table)))
+                for name in ['source', 'target'] + self.metrics:
+                    spool = self._spools.pop(name)
+                    spool.seek(0)
+                    length = 0
+                    while True:
+                        chunk = spool.read(1 << 20)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        length += len(chunk)
+                    f.write(b'\0' * _padding(length))
+                    spool.close()
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, filepath)
+        return self.edge_count
+
+
+def read_graph_bundle_columns(filepath):
+    """
+    Read a bundle's node table and columns without building per-edge dicts.
+    Returns (header, nodes, columns): columns maps 'source', 'target' and each
+    metric to an array of node indexes or fixed-point weights (divide by
+    header['weight_scale']).
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    if data[:4] != BUNDLE_MAGIC:
+        raise ValueError(f"{filepath} is not a graph bundle")
+    header_length, = struct.unpack_from('<I', data, 4)
+    header = json.loads(data[8:8 + header_length])
+    if header['version'] != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported graph bundle version {header['version']}")
+    body = 8 + header_length
+
+    def section(name):
+        layout = header['sections'][name]
+        return data[body + layout['offset']:body + layout['offset'] + layout['length']]
+
+    def column(name):
+        values = array('H' if header['sections'][name]['dtype'] == 'uint16' else 'I')
+        values.frombytes(section(name))
+        return _to_little_endian(values)
+
+    nodes = json.loads(section('nodes'))
+    columns = {name: column(name) for name in ('source', 'target')}
+    columns.update((metric, column(f'weights.{metric}')) for metric in header['metrics'])
+    return header, nodes, columns
+
+
+def read_graph_bundle(filepath):
+    """
+    Read a bundle back into (nodes, edges) in the edges.json shape. Mainly for
+    checking a bundle against the JSON output; clients should use the columns.
+    """
+    header, nodes, columns = read_graph_bundle_columns(filepath)
+    ids = [node['id'] for node in nodes]
+    scale = header['weight_scale']
+    weights = [(metric, columns[metric]) for metric in header['metrics']]
+    edges = []
+    for k, (i, j) in enumerate(zip(columns['source'], columns['target'])):
+        edge = {'source': ids[i], 'target': ids[j]}
+        for metric, values in weights:
+            edge[metric] = values[k] / scale
+        edges.append(edge)
+    return nodes, edges
@@ -0,0 +1,43 @@
+import numpy as np
+from scipy import sparse
+
+from .utils import CARD_CATEGORIES, get_card_ids_from_category
+
+
+def build_incidence_matrices(commander_data, commanders):
+    """
+    Build one commander x card incidence matrix per card category.
+
+    All matrices share the same card columns, so a per-card vector (like
+    uniqueness weights) lines up with every category.
+
+    Returns:
+    - card_index: card key (name, or ID for a CommanderStore) -> column
+    - matrices: category -> CSR matrix (1 where the commander plays the card)
+    - list_lengths: category -> array of raw list lengths per commander
+    """
+    card_index = {}
+    category_entries = {}
+    list_lengths = {}
+
+    for category in CARD_CATEGORIES:
+        rows, cols = [], []
+        lengths = np.zeros(len(commanders), dtype=np.int64)
+        for row, commander in enumerate(commanders):
+            cards = get_card_ids_from_category(commander_data, commander, category)
+            lengths[row] = len(cards)
+            # Deduplicate in list order: a set's order follows string hashing, which
+            # changes between runs and would reorder the float sums over columns
+            for card in dict.fromkeys(cards):
+                rows.append(row)
+                cols.append(card_index.setdefault(card, len(card_index)))
+        category_entries[category] = (rows, cols)
+        list_lengths[category] = lengths
+
+    shape = (len(commanders), len(card_index))
+    matrices = {}
+    for category, (rows, cols) in category_entries.items():
+        data = np.ones(len(rows), dtype=np.float64)
+        matrices[category] = sparse.csr_matrix((data, (rows, cols)), shape=shape)
+
+    return card_index, matrices, list_lengths
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+
+from .card_index import build_card_index, build_posting_matrix, generate_candidate_pairs, iter_candidate_rows
+from .data_processors import score_commander_pair, stream_edges
+from .utils import get_cards_from_category, print_processing_progress
+from .weight_calculators.overlap import build_color_fit_tables
+
+CACHE_VERSION = 3
+
+# Share of shared cards that can drift before every pair is rescored instead
+# of looking up which pairs share a drifted card (e.g. after the commander
+# count changes, which moves nearly every frequency)
+FULL_RESCORE_DRIFT = 0.5
+
+
+def commander_content_hash(commander_data, commander):
+    """
+    Hash the parts of a commander's data that edge weights depend on: the
+    card names in each group, tribes and color identity.
+    """
+    data = commander_data[commander] or {}
+    content = {
+        'card_groups': {group: sorted(get_cards_from_category(commander_data, commander, group))
+                        for group in commander_data.card_groups(commander)},
+        'tribes': data.get('tribes'),
+        'color_identity': data.get('color_identity')
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def pair_key(cmd1, cmd2):
+    """Cache key of a commander pair, the same whichever order the two come in."""
+    return f"{min(cmd1, cmd2)}\x1f{max(cmd1, cmd2)}"
+
+
+def load_edge_cache(cache_path):
+    """Load a cached edge matrix, or None if it's missing or from another version."""
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        cache = json.load(f)
+    if cache.get('version') != CACHE_VERSION:
+        return None
+    return cache
+
+
+def save_edge_cache(cache_path, hashes, frequency_basis, staples, edges):
+    cache = {
+        'version': CACHE_VERSION,
+        'hashes': hashes,
+        'frequency_basis': frequency_basis,
+        'staples': staples,
+        'edges': edges
+    }
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+
+
+def find_drifted_cards(card_frequencies, frequency_basis, tolerance):
+    """
+    Cards whose frequency moved more than `tolerance` from the value cached
+    edges were scored with. A card's uniqueness is 1 - frequency, and
+    uniqueness_weight averages over shared cards, so pairs that don't share a
+    drifted card are off by at most `tolerance`.
+    """
+    drifted = set()
+    for card in set(card_frequencies) | set(frequency_basis):
+        if abs(card_frequencies.get(card, 0) - frequency_basis.get(card, 0)) > tolerance:
+            drifted.add(card)
+    return drifted
+
+
+def drifted_share(card_index, drifted_cards):
+    """Fraction of the cards shared by two or more commanders whose frequency drifted."""
+    shared = {card for category_index in card_index.values()
+              for card, posting in category_index.items() if len(posting) > 1}
+    return len(shared & drifted_cards) / len(shared) if shared else 0
+
+
+def process_edges_incremental(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                              debug=False, staples=None, sparsifier=None, cache_path=None,
+                              frequency_tolerance=0.0005):
+    """
+    Incremental version of process_edges.
+
+    A content hash of each commander's card_groups, tribes and color_identity
+    is stored next to the full edge matrix from the last run, keyed by the
+    unordered pair (pairs that scored no edge are stored as null). On a
+    rerun only these pairs are rescored:
+    - every pair involving a commander whose hash changed (or is new)
+    - every pair sharing a card whose global frequency drifted by more than
+      frequency_tolerance since it was cached, since uniqueness_weight
+      depends on every commander through card_frequencies
+    - every candidate pair that isn't in the cache at all
+
+    Everything else is reused from the cache. The default tolerance is half
+    of the 0.001 rounding step, so reused uniqueness weights can't move by a
+    full rounding step. Card metadata (color identities) is assumed not to
+    change between runs; delete the cache to rebuild from scratch.
+    """
+    edges = iter_edges_incremental(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                                   debug, staples, cache_path, frequency_tolerance)
+    return list(stream_edges(edges, sparsifier))
+
+
+def iter_edges_incremental(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                           debug=False, staples=None, cache_path=None, frequency_tolerance=0.0005):
+    """
+    Generator version of process_edges_incremental. The cache is only
+    written once the stream has been fully consumed.
+    """
+    print("Processing edges (incremental)...")
+
+    commanders = [n['id'] for n in nodes]
+    hashes = {c: commander_content_hash(commander_data, c) for c in commanders}
+    staples = sorted(staples) if staples else []
+
+    cache = load_edge_cache(cache_path) if cache_path else None
+    if cache and cache['staples'] != staples:
+        print("Staples list changed, ignoring edge cache")
+        cache = None
+    if cache is None:
+        cache = {'hashes': {}, 'frequency_basis': {}, 'edges': {}}
+
+    cached_hashes = cache['hashes']
+    cached_edges = cache['edges']
+    changed = {i for i, c in enumerate(commanders) if cached_hashes.get(c) != hashes[c]}
+
+    card_index = build_card_index(commander_data, commanders)
+
+    # Frequencies are global, so cards that drifted too far invalidate cached uniqueness
+    frequency_basis = dict(cache['frequency_basis'])
+    drifted_cards = find_drifted_cards(card_frequencies, frequency_basis, frequency_tolerance)
+    # Nothing to reuse when every commander changed (e.g. the first run) or
+    # most cards drifted; otherwise pairs sharing a drifted card come from
+    # the posting product of just those cards (staples included, since they
+    # count towards uniqueness), a row at a time alongside the candidates
+    rescore_all = (len(changed) == len(commanders)
+                   or drifted_share(card_index, drifted_cards) > FULL_RESCORE_DRIFT)
+    drifted_rows = None
+    if not rescore_all:
+        drifted_rows = iter_candidate_rows(build_posting_matrix(card_index, len(commanders), cards=drifted_cards))
+    for card in drifted_cards:
+        if card in card_frequencies:
+            frequency_basis[card] = card_frequencies[card]
+        else:
+            frequency_basis.pop(card, None)
+
+    print(f"{len(changed)} of {len(commanders)} commanders changed, "
+          f"{len(drifted_cards)} card frequencies drifted past {frequency_tolerance}")
+    if rescore_all and changed != set(range(len(commanders))):
+        print("Most card frequencies drifted, rescoring every pair")
+
+    _, fit_tables = build_color_fit_tables(commander_data, commanders, card_metadata)
+
+    new_edges = {}
+    rescored = reused = 0
+    for i, candidates, _ in generate_candidate_pairs(card_index, len(commanders), staples):
+        print_processing_progress(i, len(commanders))
+        drifted = set(next(drifted_rows)[1]) if drifted_rows else ()
+        for j in candidates:
+            cmd1, cmd2 = commanders[i], commanders[j]
+            key = pair_key(cmd1, cmd2)
+            if rescore_all or i in changed or j in changed or j in drifted or key not in cached_edges:
+                edge = score_commander_pair(
+                    cmd1, cmd2, i, j,
+                    commander_data, card_metadata, card_frequencies, normalized_tribes, fit_tables
+                )
+                rescored += 1
+            else:
+                edge = cached_edges[key]
+                # Weights are symmetric; only the endpoints follow the current commander order
+                if edge and edge['source'] != cmd1:
+                    edge = dict(edge, source=cmd1, target=cmd2)
+                reused += 1
+            new_edges[key] = edge
+            if edge:
+                yield edge
+
+    print(f"Rescored {rescored} pairs, reused {reused} cached pairs")
+    if cache_path:
+        save_edge_cache(cache_path, hashes, frequency_basis, staples, new_edges)
@@ -0,0 +1,165 @@
+import json
+import os
+import pathlib
+import sqlite3
+from collections.abc import Mapping
+
+from .stages import project_metadata
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.index.sqlite'
+
+
+def index_path_for(dump_path):
+    """The index lives next to the dump: default-cards-....json.index.sqlite"""
+    return dump_path + INDEX_SUFFIX
+
+
+def dump_signature(dump_path):
+    """What the index is keyed on: the dump's absolute path, size and mtime."""
+    stat = os.stat(dump_path)
+    return {
+        'dump_path': os.path.abspath(dump_path),
+        'size': str(stat.st_size),
+        'mtime_ns': str(stat.st_mtime_ns),
+        'version': str(INDEX_VERSION)
+    }
+
+
+def build_card_metadata_index(dump_path, card_metadata, index_path=None):
+    """
+    Compile parsed card metadata (as returned by load_card_metadata) into a
+    SQLite file keyed on the dump's signature. The file is written to a
+    temporary path and moved into place, so readers never see half an index.
+    """
+    index_path = index_path or index_path_for(dump_path)
+    tmp_path = index_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+        conn.execute("""
+            CREATE TABLE cards (
+                name TEXT PRIMARY KEY,
+                color_identity TEXT,
+                rarity TEXT,
+                image_small TEXT,
+                image_normal TEXT,
+                edhrec_rank INTEGER,
+                type_line TEXT,
+                released_at TEXT
+            ) WITHOUT ROWID
+        """)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", dump_signature(dump_path).items())
+        conn.executemany(
+            "INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    name,
+                    json.dumps(card['color_identity']),
+                    card['rarity'],
+                    card['image_uris']['small'],
+                    card['image_uris']['normal'],
+                    card['edhrec_rank'],
+                    card['type_line'],
+                    card.get('released_at')
+                )
+                for name, card in card_metadata.items()
+            )
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, index_path)
+    print(f"Wrote card metadata index for {len(card_metadata)} cards to {os.path.basename(index_path)}")
+
+
+def open_card_metadata_index(dump_path, index_path=None, fields=None):
+    """
+    Open the index for a dump, or return None if it's missing or was built
+    from a different dump (path, size, mtime or index version changed).
+    Pass fields to only return those metadata keys.
+    """
+    index_path = index_path or index_path_for(dump_path)
+    if not os.path.exists(index_path):
+        return None
+    index = CardMetadataIndex(index_path, fields)
+    try:
+        stored = dict(index.connection.execute("SELECT key, value FROM meta"))
+    except sqlite3.DatabaseError:
+        stored = None
+    if stored != dump_signature(dump_path):
+        index.close()
+        return None
+    return index
+
+
+class CardMetadataIndex(Mapping):
+    """
+    Read-only, lazily loaded view of a compiled card metadata index.
+
+    Works as a Mapping of card name -> metadata dict with the same shape
+    load_card_metadata returns. Rows are read on first access and cached.
+    The connection is reopened after pickling or in a forked worker, so the
+    index can be handed to the parallel edge engine like a dict. With fields,
+    entries only carry those keys.
+    """
+
+    def __init__(self, index_path, fields=None):
+        self.index_path = index_path
+        self.fields = fields
+        self._cache = {}
+        self._conn = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        if self._conn is None or self._pid != os.getpid():
+            uri = pathlib.Path(os.path.abspath(self.index_path)).as_uri() + '?mode=ro'
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __getstate__(self):
+        return {'index_path': self.index_path, 'fields': self.fields}
+
+    def __setstate__(self, state):
+        self.__init__(state['index_path'], state['fields'])
+
+    def __getitem__(self, name):
+        card = self._cache.get(name)
+        if card is None:
+            row = self.connection.execute(
+                "SELECT color_identity, rarity, image_small, image_normal, edhrec_rank, type_line, released_at "
+                "FROM cards WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(name)
+            color_identity, rarity, small, normal, edhrec_rank, type_line, released_at = row
+            card = {
+                'color_identity': json.loads(color_identity),
+                'rarity': rarity,
+                'image_uris': {'small': small, 'normal': normal},
+                'edhrec_rank': edhrec_rank,
+                'type_line': type_line
+            }
+            if released_at is not None:
+                card['released_at'] = released_at
+            if self.fields is not None:
+                card = project_metadata(card, self.fields)
+            self._cache[name] = card
+        return card
+
+    def __iter__(self):
+        for (name,) in self.connection.execute("SELECT name FROM cards ORDER BY name"):
+            yield name
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
@@ -0,0 +1,203 @@
+import argparse
+import os
+import zlib
+
+import numpy as np
+
+from .data_loaders import DEFAULT_CARD_DUMP, SCRIPTS_DIR, load_card_metadata, load_commander_data
+from .data_processors import process_edges, process_nodes, score_commander_pair, stream_edges
+from .utils import (CARD_CATEGORIES, STAPLE_CARDS, get_cards_from_category, get_referenced_card_names,
+                    print_processing_progress)
+from .weight_calculators.overlap import build_color_fit_tables
+from .weight_calculators.tribes import normalize_tribe_counts
+from .weight_calculators.uniqueness import calculate_card_frequencies
+
+MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def commander_tokens(commander_data, commander, staples=()):
+    """
+    Hash each (category, card) a commander plays to a 32-bit token.
+    Overlap only counts within a category, so the same card in two
+    categories is two different tokens. Cards in staples get no token, so
+    pairs whose only shared cards are staples have nothing to collide on.
+    """
+    return {
+        zlib.crc32(f"{category}\x1f{card}".encode('utf-8'))
+        for category in CARD_CATEGORIES
+        for card in get_cards_from_category(commander_data, commander, category)
+        if card not in staples
+    }
+
+
+def build_minhash_signatures(commander_data, commanders, num_perm=128, seed=1, staples=None):
+    """
+    Build a MinHash signature per commander over its per-category card sets.
+
+    Each of the num_perm hash functions is a multiply-shift hash
+    h(x) = (a * x + b) >> 32 with random 64-bit a (odd) and b. The fraction of
+    positions where two signatures agree estimates the Jaccard similarity of
+    the two token sets.
+
+    Returns an (n, num_perm) uint64 array. Commanders without cards (or
+    only staples, when given) get a row of MAX_HASH, which never matches a
+    real signature.
+    """
+    staples = set(staples or ())
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    signatures = np.full((len(commanders), num_perm), MAX_HASH, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for row, commander in enumerate(commanders):
+            tokens = np.fromiter(commander_tokens(commander_data, commander, staples), dtype=np.uint64)
+            if len(tokens):
+                hashes = (tokens[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)
+                signatures[row] = hashes.min(axis=0)
+    return signatures
+
+
+def choose_bands(num_perm, threshold):
+    """
+    Pick (bands, rows) with bands * rows == num_perm whose LSH threshold
+    (1 / bands) ** (1 / rows) is closest to the target Jaccard similarity.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def lsh_candidate_pairs(signatures, bands, rows):
+    """
+    Split signatures into bands of `rows` values and bucket commanders by
+    each band. Commanders that land in the same bucket for any band become a
+    candidate pair. Returns a sorted list of (i, j) with i < j.
+    """
+    empty = (signatures == MAX_HASH).all(axis=1)
+    candidates = set()
+    for band in range(bands):
+        buckets = {}
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for row in range(len(signatures)):
+            if not empty[row]:
+                buckets.setdefault(band_values[row].tobytes(), []).append(row)
+        for members in buckets.values():
+            for a in range(len(members)):
+                for j in members[a + 1:]:
+                    candidates.add((members[a], j))
+    return sorted(candidates)
+
+
+def process_edges_lsh(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                      debug=False, staples=None, sparsifier=None, num_perm=128, threshold=0.15, seed=1):
+    """
+    Approximate version of process_edges for catalog-scale runs.
+
+    MinHash signatures and LSH banding pick candidate pairs that are likely to
+    be similar; only those are scored exactly with the usual weight
+    calculators. Pairs LSH misses get no edge, so this trades recall for
+    speed. See report_lsh_recall for how much is missed at each num_perm.
+    """
+    edges = iter_edges_lsh(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                           debug, staples, num_perm, threshold, seed)
+    return list(stream_edges(edges, sparsifier))
+
+
+def iter_edges_lsh(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                   debug=False, staples=None, num_perm=128, threshold=0.15, seed=1):
+    """Generator version of process_edges_lsh: yields each edge as soon as it's scored."""
+    print(f"Processing edges (MinHash LSH, {num_perm} permutations)...")
+
+    commanders = [n['id'] for n in nodes]
+    bands, rows = choose_bands(num_perm, threshold)
+    # Staples are left out of the signatures, so they never produce candidates in the first place
+    signatures = build_minhash_signatures(commander_data, commanders, num_perm, seed, staples)
+    candidates = lsh_candidate_pairs(signatures, bands, rows)
+    total_pairs = len(commanders) * (len(commanders) - 1) // 2
+    print(f"LSH with {bands} bands x {rows} rows: {len(candidates)} of {total_pairs} pairs are candidates")
+
+    _, fit_tables = build_color_fit_tables(commander_data, commanders, card_metadata)
+
+    last_row = -1
+    for i, j in candidates:
+        if i != last_row:
+            print_processing_progress(i, len(commanders))
+            last_row = i
+        edge = score_commander_pair(
+            commanders[i], commanders[j], i, j,
+            commander_data, card_metadata, card_frequencies, normalized_tribes, fit_tables
+        )
+        if edge:
+            yield edge
+
+
+def report_lsh_recall(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                      num_perms=(16, 32, 64, 128, 256), threshold=0.15, metric='composite_weight',
+                      top_fraction=0.1, seed=1, staples=None):
+    """
+    Compare LSH candidates against the exact engine to help choose num_perm.
+
+    The edges that matter are the exact engine's strongest top_fraction by
+    `metric`. For each signature size this prints how many pairs LSH would
+    score and what fraction of those strong edges it finds. With staples,
+    both engines skip staple-only pairs, as with --skip-staple-pairs.
+    """
+    commanders = [n['id'] for n in nodes]
+    index = {c: i for i, c in enumerate(commanders)}
+    exact_edges = process_edges(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                                staples=staples)
+    exact_edges.sort(key=lambda e: e[metric], reverse=True)
+    strong = {
+        tuple(sorted((index[e['source']], index[e['target']])))
+        for e in exact_edges[:max(1, int(len(exact_edges) * top_fraction))]
+    }
+    total_pairs = len(commanders) * (len(commanders) - 1) // 2
+
+    print(f"\nLSH recall of the top {top_fraction:.0%} {metric} edges ({len(strong)} edges, "
+          f"{len(commanders)} commanders, target Jaccard {threshold}):")
+    print(f"{'num_perm':>8} {'bands x rows':>13} {'candidates':>11} {'scored':>7} {'recall':>7}")
+    results = []
+    for num_perm in num_perms:
+        bands, rows = choose_bands(num_perm, threshold)
+        signatures = build_minhash_signatures(commander_data, commanders, num_perm, seed, staples)
+        candidates = set(lsh_candidate_pairs(signatures, bands, rows))
+        recall = len(strong & candidates) / len(strong) if strong else 0
+        scored = len(candidates) / total_pairs if total_pairs else 0
+        print(f"{num_perm:>8} {f'{bands} x {rows}':>13} {len(candidates):>11} {scored:>7.1%} {recall:>7.1%}")
+        results.append({'num_perm': num_perm, 'bands': bands, 'rows': rows,
+                        'candidates': len(candidates), 'recall': recall})
+    return results
+
+
+def main(argv=None):
+    """Print LSH recall against the exact engine for the bundled commander data."""
+    parser = argparse.ArgumentParser(description="Report MinHash LSH recall against the exact edge engine")
+    parser.add_argument('--commander-data', default='../data/extracted_commander_data.json',
+                        help="Commander data file, relative to the scripts directory")
+    parser.add_argument('--num-perms', type=int, nargs='+', default=[16, 32, 64, 128, 256])
+    parser.add_argument('--threshold', type=float, default=0.15, help="Target Jaccard similarity")
+    parser.add_argument('--top-fraction', type=float, default=0.1,
+                        help="Fraction of strongest exact edges LSH should find")
+    parser.add_argument('--skip-staple-pairs', action='store_true',
+                        help="Skip pairs whose only shared cards are format staples in both engines")
+    parser.add_argument('--card-dump', default=DEFAULT_CARD_DUMP,
+                        help="Scryfall dump, relative to the scripts directory. Without it the check still "
+                             "runs, but color fit (and so composite_weight) ignores card colors")
+    args = parser.parse_args(argv)
+
+    commander_data = load_commander_data(args.commander_data)
+    if os.path.exists(os.path.join(SCRIPTS_DIR, args.card_dump)):
+        card_metadata = load_card_metadata(args.card_dump, card_names=get_referenced_card_names(commander_data))
+    else:
+        print(f"Card dump {args.card_dump} not found, measuring without card metadata")
+        card_metadata = {}
+    nodes = process_nodes(commander_data, card_metadata)
+    report_lsh_recall(
+        commander_data, nodes, card_metadata,
+        calculate_card_frequencies(commander_data), normalize_tribe_counts(commander_data),
+        num_perms=args.num_perms, threshold=args.threshold, top_fraction=args.top_fraction,
+        staples=STAPLE_CARDS if args.skip_staple_pairs else None
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from .card_index import build_card_index, build_posting_matrix, count_candidate_pairs, iter_candidate_rows
+from .data_processors import score_commander_pair, stream_edges
+from .weight_calculators.overlap import build_color_fit_tables
+
+# Read-only inputs, set once per worker process by _init_worker
+_worker_state = {}
+
+
+def split_upper_triangle(pairs_per_row, num_blocks):
+    """
+    Split the upper triangle into contiguous row ranges with about the same
+    number of candidate pairs each. Row i of the triangle has up to n - i - 1
+    pairs, so equal row counts would leave the first block with most of the work.
+
+    Returns a list of (start_row, stop_row) tuples in row order.
+    """
+    total_pairs = int(sum(pairs_per_row))
+    target = max(1, total_pairs // max(1, num_blocks))
+
+    blocks = []
+    start = 0
+    block_pairs = 0
+    for i, row_pairs in enumerate(pairs_per_row):
+        block_pairs += row_pairs
+        if block_pairs >= target:
+            blocks.append((start, i + 1))
+            start = i + 1
+            block_pairs = 0
+    if start < len(pairs_per_row):
+        blocks.append((start, len(pairs_per_row)))
+    return blocks
+
+
+def _init_worker(commanders, postings, commander_data, card_metadata, card_frequencies,
+                 normalized_tribes, fit_tables):
+    _worker_state.update(
+        commanders=commanders,
+        postings=postings,
+        commander_data=commander_data,
+        card_metadata=card_metadata,
+        card_frequencies=card_frequencies,
+        normalized_tribes=normalized_tribes,
+        fit_tables=fit_tables
+    )
+
+
+def _score_block(block):
+    """Score every candidate pair in a row range, in serial order."""
+    start, stop = block
+    state = _worker_state
+    commanders = state['commanders']
+    edges = []
+    for i, candidates, _ in iter_candidate_rows(state['postings'], start, stop):
+        for j in candidates:
+            edge = score_commander_pair(
+                commanders[i], commanders[j], i, j,
+                state['commander_data'], state['card_metadata'], state['card_frequencies'],
+                state['normalized_tribes'], state['fit_tables']
+            )
+            if edge:
+                edges.append(edge)
+    return edges
+
+
+def process_edges_parallel(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                           debug=False, staples=None, sparsifier=None, workers=2, blocks_per_worker=4):
+    """
+    Process-pool version of process_edges.
+
+    The upper triangle is split into balanced row blocks that are scored in a
+    ProcessPoolExecutor. The read-only inputs (including the sparse posting
+    matrix, rather than every candidate pair) go to each worker once through
+    the pool initializer; tasks only carry their (start, stop) rows and each
+    worker generates its own rows' candidates.
+
+    Blocks are contiguous and results come back in submission order, so the
+    merged edge list is in the same order as the serial run and edges.json is
+    byte-identical for any worker count.
+    """
+    edges = iter_edges_parallel(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                                debug, staples, workers, blocks_per_worker)
+    return list(stream_edges(edges, sparsifier))
+
+
+def iter_edges_parallel(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                        debug=False, staples=None, workers=2, blocks_per_worker=4):
+    """Generator version of process_edges_parallel: yields each block's edges as it completes."""
+    print(f"Processing edges with {workers} workers...")
+
+    commanders = [n['id'] for n in nodes]
+    _, fit_tables = build_color_fit_tables(commander_data, commanders, card_metadata)
+    card_index = build_card_index(commander_data, commanders)
+    postings = build_posting_matrix(card_index, len(commanders), staples)
+    blocks = split_upper_triangle(count_candidate_pairs(postings), workers * blocks_per_worker)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(commanders, postings, commander_data, card_metadata, card_frequencies,
+                  normalized_tribes, fit_tables)
+    ) as executor:
+        for block_number, edges in enumerate(executor.map(_score_block, blocks), 1):
+            print(f"Finished block {block_number}/{len(blocks)}...")
+            yield from edges
@@ -1,20 +1,136 @@
+import argparse
 import os
-from .data_loaders import load_commander_data, load_card_metadata, save_results
-from .data_processors import process_nodes, process_edges
+from collections import Counter
+from functools import partial
+from .artifacts import BROTLI_QUALITY, RELEASE_BROTLI_QUALITY
+from .commander_shards import ShardedCommanderData
+from .commander_store import CommanderStore
+from .data_loaders import DEFAULT_CARD_DUMP, EDGE_FORMATS, load_commander_data, load_card_metadata, save_results
+from .data_processors import process_nodes, iter_edges, stream_edges
+from .incremental import iter_edges_incremental
+from .minhash_lsh import iter_edges_lsh
+from .parallel_edges import iter_edges_parallel
+from .sparse_edges import iter_edges_sparse
+from .sparsification import SPARSIFIERS, WEIGHT_METRICS, create_sparsifier
+from .stages import EDGE_STAGES, PIPELINE_STAGES, fields_for_stages
 from .weight_calculators.uniqueness import calculate_card_frequencies
 from .weight_calculators.tribes import normalize_tribe_counts
-from .utils import print_example_frequencies, print_tribe_distribution
-
-def main():
+from .utils import (STAPLE_CARDS, count_tribe_weights, get_referenced_card_names, print_example_frequencies,
+                    print_tribe_distribution)
+
+EDGE_ENGINES = {
+    'pairwise': iter_edges,    # Reference implementation, one pair at a time
+    'sparse': iter_edges_sparse,  # Sparse incidence matrices, scales to the full commander list
+    'lsh': iter_edges_lsh        # Approximate: MinHash LSH candidates, scored exactly
+}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare commander graph data for visualization")
+    parser.add_argument('--commander-data', default='extracted_commander_data.json',
+                        help="Commander data JSON file or sharded dataset directory, relative to the scripts directory")
+    parser.add_argument('--stages', nargs='+', choices=PIPELINE_STAGES, default=PIPELINE_STAGES,
+                        help="Stages whose fields the loaders keep (default: all). nodes is always on. "
+                             "The edge stages (overlap, uniqueness, tribes) go together: every engine scores "
+                             "all of their metrics, so give all of them or none (nodes only, edges skipped)")
+    parser.add_argument('--card-dump', default=DEFAULT_CARD_DUMP,
+                        help="Scryfall default-cards dump, relative to the scripts directory")
+    parser.add_argument('--no-card-index', action='store_true',
+                        help="Parse the card dump directly instead of using the compiled SQLite index")
+    parser.add_argument('--parse-workers', type=int, default=1,
+                        help="Parse the card dump in N worker processes when it has to be read (default: 1)")
+    parser.add_argument('--engine', choices=sorted(EDGE_ENGINES), default='pairwise',
+                        help="Edge computation engine (default: pairwise). --workers and --incremental are "
+                             "modes of the pairwise engine and can't be combined with each other")
+    parser.add_argument('--skip-staple-pairs', action='store_true',
+                        help="Skip commander pairs whose only shared cards are in STAPLE_CARDS")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="pairwise engine: score edges in N worker processes (default: 1, no pool)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="pairwise engine: reuse cached edges from the last run, rescoring only changed "
+                             "commanders (serial only)")
+    parser.add_argument('--frequency-tolerance', type=float,
+                        help="incremental: card frequency drift that invalidates cached uniqueness (default: 0.0005)")
+    parser.add_argument('--lsh-perm', type=int,
+                        help="lsh engine: MinHash signature size (default: 128)")
+    parser.add_argument('--lsh-threshold', type=float,
+                        help="lsh engine: target Jaccard similarity for banding (default: 0.15)")
+    parser.add_argument('--sparsify', choices=sorted(SPARSIFIERS),
+                        help="Sparsify edges while they're computed (default: keep every positive pair)")
+    parser.add_argument('--sparsify-metric', choices=WEIGHT_METRICS, default='composite_weight',
+                        help="Weight metric the sparsifier ranks edges by (default: composite_weight)")
+    parser.add_argument('--top-k', type=int,
+                        help="topk: edges kept per commander (default: 10)")
+    parser.add_argument('--percentile', type=float,
+                        help="percentile: keep edges at or above this percentile (default: 90)")
+    parser.add_argument('--significance', type=float,
+                        help="disparity: alpha below which an edge is kept (default: 0.05)")
+    parser.add_argument('--edge-format', choices=sorted(EDGE_FORMATS), default='pretty',
+                        help="Edge output: pretty (indented edges.json), json (minified) or ndjson (default: pretty)")
+    parser.add_argument('--no-publish', action='store_true',
+                        help="Skip the content-hashed, precompressed copies and manifest.json")
+    parser.add_argument('--brotli-quality', type=int, choices=range(12), default=BROTLI_QUALITY, metavar='0-11',
+                        help=f"Brotli quality of the published copies (default: {BROTLI_QUALITY}; "
+                             f"use {RELEASE_BROTLI_QUALITY} for release publishes)")
+    args = parser.parse_args(argv)
+    edge_stages = set(args.stages) & set(EDGE_STAGES)
+    if edge_stages and edge_stages != set(EDGE_STAGES):
+        parser.error(f"--stages needs all of {', '.join(EDGE_STAGES)} or none of them; "
+                     f"edges score every metric, and without {', '.join(sorted(set(EDGE_STAGES) - edge_stages))} "
+                     f"some would be computed from data that wasn't loaded")
+    if args.workers > 1 and args.engine != 'pairwise':
+        parser.error("--workers only applies to the pairwise engine")
+    if args.incremental and (args.engine != 'pairwise' or args.workers > 1):
+        parser.error("--incremental only applies to the serial pairwise engine")
+
+    # Options that only mean something in one mode are rejected elsewhere
+    # instead of being silently ignored; otherwise they get their defaults
+    mode_options = [
+        ('frequency_tolerance', args.incremental, 0.0005, "--frequency-tolerance needs --incremental"),
+        ('lsh_perm', args.engine == 'lsh', 128, "--lsh-perm needs --engine lsh"),
+        ('lsh_threshold', args.engine == 'lsh', 0.15, "--lsh-threshold needs --engine lsh"),
+        ('top_k', args.sparsify == 'topk', 10, "--top-k needs --sparsify topk"),
+        ('percentile', args.sparsify == 'percentile', 90, "--percentile needs --sparsify percentile"),
+        ('significance', args.sparsify == 'disparity', 0.05, "--significance needs --sparsify disparity")
+    ]
+    for name, applies, default, message in mode_options:
+        if getattr(args, name) is None:
+            setattr(args, name, default)
+        elif not applies:
+            parser.error(message)
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    if not 0 <= args.percentile <= 100:
+        parser.error("--percentile must be between 0 and 100")
+    return args
+
+def main(argv=None):
     """Main execution function for preparing visualization data"""
+    args = parse_args(argv)
     
     # Create viz_data directory if it doesn't exist
     viz_data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'viz_data')
     os.makedirs(viz_data_path, exist_ok=True)
 
+    # Loaders only keep the fields the enabled stages read
+    stages = set(args.stages) | {'nodes'}
+    fields = fields_for_stages(stages)
+
     # Load data sources
-    commander_data = load_commander_data()
-    card_metadata = load_card_metadata()
+    commander_data = load_commander_data(args.commander_data, fields)
+    # Intern card names and keep card lists as ID arrays instead of nested dicts.
+    # Sharded data stays lazy unless an engine that compares card lists pair by
+    # pair (and so needs all of them at hand) runs; everything else makes
+    # single passes that decode one shard record at a time
+    if 'card_groups' in fields['commander']:
+        if not isinstance(commander_data, ShardedCommanderData) or args.engine != 'sparse':
+            commander_data = CommanderStore.from_commander_data(commander_data)
+    # Card metadata comes from an index compiled once per dump; without it only
+    # cards the commanders reference (and the commanders) are parsed from the
+    # dump. Collecting those names reads every card list (and decodes every
+    # shard), so it's only done when they're needed
+    card_names = get_referenced_card_names(commander_data) if args.no_card_index else None
+    card_metadata = load_card_metadata(args.card_dump, card_names, use_index=not args.no_card_index,
+                                       workers=args.parse_workers, fields=fields)
 
 
 
@@ -38,22 +154,50 @@ def main():
     print("Calculating normalized tribe weights...")
     normalized_tribes = normalize_tribe_counts(commander_data, debug=True)  # Set debug=True to see distributions
 
-    # Process edges with all weight calculations
-    edges = process_edges(
-        commander_data=commander_data,
-        nodes=nodes,
-        card_metadata=card_metadata,
-        card_frequencies=card_frequencies,
-        normalized_tribes=normalized_tribes,
-        debug=True
-    )
+    # Optional sparsification, applied as edges are produced
+    sparsifier = None
+    if args.sparsify:
+        sparsifier_params = {
+            'topk': {'k': args.top_k},
+            'percentile': {'percentile': args.percentile},
+            'disparity': {'significance': args.significance}
+        }[args.sparsify]
+        sparsifier = create_sparsifier(args.sparsify, args.sparsify_metric, **sparsifier_params)
+
+    # Process edges with all weight calculations. Engines are generators, so
+    # edges stream through the sparsifier straight into the writer.
+    # parse_args has already rejected conflicting modes, so at most one applies
+    edge_engine = EDGE_ENGINES[args.engine]
+    if args.engine == 'lsh':
+        edge_engine = partial(iter_edges_lsh, num_perm=args.lsh_perm, threshold=args.lsh_threshold)
+    if args.workers > 1:
+        edge_engine = partial(iter_edges_parallel, workers=args.workers)
+    if args.incremental:
+        edge_engine = partial(iter_edges_incremental,
+                              cache_path=os.path.join(viz_data_path, 'edge_cache.json'),
+                              frequency_tolerance=args.frequency_tolerance)
+    if stages.isdisjoint(EDGE_STAGES):
+        print("No edge stages enabled, skipping edges")
+        edges = iter(())
+    else:
+        edges = edge_engine(
+            commander_data=commander_data,
+            nodes=nodes,
+            card_metadata=card_metadata,
+            card_frequencies=card_frequencies,
+            normalized_tribes=normalized_tribes,
+            debug=True,
+            staples=STAPLE_CARDS if args.skip_staple_pairs else None
+        )
+    tribe_weights = Counter()
+    edges = count_tribe_weights(stream_edges(edges, sparsifier), tribe_weights)
+
+    # Save processed data
+    save_results(nodes, edges, edge_format=args.edge_format, publish=not args.no_publish,
+                 brotli_quality=args.brotli_quality)
 
     # Print tribe weight distribution for debugging
-    tribe_weights = [edge['tribes_weight'] for edge in edges if edge['tribes_weight'] > 0]
     print_tribe_distribution(tribe_weights)
 
-    # Save processed data
-    save_results(nodes, edges)
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import numpy as np
+
+from .data_processors import stream_edges
+from .card_index import build_card_index, generate_candidate_pairs
+from .incidence import build_incidence_matrices
+from .utils import (CARD_CATEGORIES, DEBUG_PAIRS, get_card_key_frequencies, get_cards_from_category,
+                    get_commander_record, print_processing_progress)
+from .weight_calculators.overlap import build_color_fit_tables, calculate_normalized_overlap_matrix
+from .weight_calculators.uniqueness import (build_uniqueness_weights, calculate_uniqueness_matrix,
+                                            calculate_uniqueness_weight)
+from .weight_calculators.tribes import (SIMPLIFIED_POSITION_DECAY, SIMPLIFIED_TOP_N, build_tribe_rank_matrix,
+                                        build_tribe_weight_matrix, calculate_tribes_simplified_weight,
+                                        calculate_tribes_simplified_weight_matrix, calculate_tribes_weight_matrix)
+
+
+def process_edges_sparse(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                         debug=False, staples=None, sparsifier=None, block_size=256):
+    """
+    Sparse-matrix version of process_edges.
+
+    Instead of rebuilding card sets for every pair, each category becomes a
+    commander x card incidence matrix A, and all raw overlaps come from A @ A.T.
+    Uniqueness uses the same product with a diagonal of (1 - frequency) weights:
+
+        uniqueness[i, j] = (A W A.T)[i, j] / (A A.T)[i, j]
+
+    Products are taken one block of rows at a time so memory stays at
+    block_size x n per category. Edges and their fields match process_edges,
+    including which pairs are visited when staples are skipped.
+    """
+    edges = iter_edges_sparse(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                              debug, staples, block_size)
+    return list(stream_edges(edges, sparsifier))
+
+
+def iter_edges_sparse(commander_data, nodes, card_metadata, card_frequencies, normalized_tribes,
+                      debug=False, staples=None, block_size=256):
+    """Generator version of process_edges_sparse: yields edges one row block at a time."""
+    print("Processing edges (sparse engine)...")
+
+    commanders = [n['id'] for n in nodes]
+    n = len(commanders)
+    card_index, matrices, list_lengths = build_incidence_matrices(commander_data, commanders)
+
+    # Per-card uniqueness weights, aligned with the matrix columns
+    key_frequencies = get_card_key_frequencies(commander_data, card_frequencies)
+    uniqueness_weights = build_uniqueness_weights(card_index, key_frequencies)
+
+    # Denominators for raw weight normalization
+    total_cards = sum(list_lengths[cat] for cat in CARD_CATEGORIES)
+
+    # Color fit counts over the 32 WUBRG subsets, per commander and category
+    commander_masks, fit_tables = build_color_fit_tables(commander_data, commanders, card_metadata)
+
+    # Candidate rows come out in order, one per commander, alongside the blocks below
+    candidate_rows = generate_candidate_pairs(build_card_index(commander_data, commanders), n, staples)
+
+    # Tribe weights and top-n ranks, computed once per commander
+    _, tribe_weights = build_tribe_weight_matrix(normalized_tribes, commanders)
+    _, tribe_ranks = build_tribe_rank_matrix(normalized_tribes, commanders, SIMPLIFIED_TOP_N)
+
+    has_data = [bool(get_commander_record(commander_data, c)) for c in commanders]
+    transposed = {cat: matrices[cat].T.tocsc() for cat in CARD_CATEGORIES}
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        rows = np.arange(start, stop)
+        raw_block = np.zeros((stop - start, n))
+        normalized_block = np.zeros((stop - start, n))
+        uniqueness_block = np.zeros((stop - start, n))
+        for category in CARD_CATEGORIES:
+            block = matrices[category][start:stop]
+            overlap = (block @ transposed[category]).toarray()
+            raw_block += overlap
+            normalized_block += calculate_normalized_overlap_matrix(overlap, fit_tables[category], commander_masks, rows)
+            uniqueness_block += calculate_uniqueness_matrix(
+                matrices[category], uniqueness_weights, rows=slice(start, stop), overlap=overlap
+            )
+        normalized_block /= len(CARD_CATEGORIES)
+        uniqueness_block /= len(CARD_CATEGORIES)
+        tribes_block = calculate_tribes_weight_matrix(tribe_weights, rows)
+        tribes_simplified_block = calculate_tribes_simplified_weight_matrix(
+            tribe_ranks, SIMPLIFIED_POSITION_DECAY, SIMPLIFIED_TOP_N, rows
+        )
+
+        for i in range(start, stop):
+            print_processing_progress(i, n)
+            _, candidates, _ = next(candidate_rows)
+            if not has_data[i]:
+                continue
+            row = i - start
+            cmd1 = commanders[i]
+
+            for j in candidates:
+                if not has_data[j]:
+                    continue
+                cmd2 = commanders[j]
+
+                if debug and ((cmd1, cmd2) in DEBUG_PAIRS or (cmd2, cmd1) in DEBUG_PAIRS):
+                    print(f"\nAnalyzing uniqueness between {cmd1} and {cmd2}")
+                    for category in CARD_CATEGORIES:
+                        cards1 = get_cards_from_category(commander_data, cmd1, category)
+                        cards2 = get_cards_from_category(commander_data, cmd2, category)
+                        print(f"\nCategory: {category}")
+                        calculate_uniqueness_weight(cards1, cards2, card_frequencies, debug=True)
+
+                max_possible_overlap = min(total_cards[i], total_cards[j])
+                normalized_raw_weight = raw_block[row, j] / max_possible_overlap if max_possible_overlap > 0 else 0
+                total_normalized_overlap = normalized_block[row, j]
+                avg_uniqueness = uniqueness_block[row, j]
+                composite_score = (total_normalized_overlap * 0.5) + (avg_uniqueness * 0.5)
+
+                if composite_score > 0:
+                    if debug and (cmd1, cmd2) in DEBUG_PAIRS:
+                        calculate_tribes_simplified_weight(
+                            cmd1, cmd2, normalized_tribes, SIMPLIFIED_TOP_N, SIMPLIFIED_POSITION_DECAY, debug=True
+                        )
+                    yield {
+                        "source": cmd1,
+                        "target": cmd2,
+                        "raw_weight": round(float(normalized_raw_weight), 3),
+                        "normalized_weight": round(float(total_normalized_overlap), 3),
+                        "uniqueness_weight": round(float(avg_uniqueness), 3),
+                        "tribes_weight": round(float(tribes_block[row, j]), 3),
+                        "tribes_simplified_weight": round(float(tribes_simplified_block[row, j]), 3),
+                        "composite_weight": round(float(composite_score), 3),
+                    }
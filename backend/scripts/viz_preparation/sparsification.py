@@ -0,0 +1,194 @@
+import heapq
+import json
+import tempfile
+from abc import ABC, abstractmethod
+
+WEIGHT_METRICS = [
+    "raw_weight",
+    "normalized_weight",
+    "uniqueness_weight",
+    "tribes_weight",
+    "tribes_simplified_weight",
+    "composite_weight"
+]
+
+
+class TopKSparsifier:
+    """
+    Keep each commander's k strongest edges on one metric.
+
+    An edge survives if it is in the top k of either endpoint, so every
+    commander keeps at least min(k, degree) edges. Only the current top-k
+    edges per commander are held, never the full edge list.
+    """
+
+    def __init__(self, metric='composite_weight', k=10):
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.metric = metric
+        self.k = k
+        self.seen = 0
+        self._heaps = {}      # commander -> min-heap of (weight, -seq); ties keep the earlier edge
+        self._held = {}       # seq -> [edge, number of heaps holding it]
+
+    def add(self, edge):
+        seq = self.seen
+        self.seen += 1
+        entry = (edge[self.metric], -seq)
+        for commander in (edge['source'], edge['target']):
+            heap = self._heaps.setdefault(commander, [])
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                self._release(-heapq.heapreplace(heap, entry)[1])
+            else:
+                continue
+            self._held.setdefault(seq, [edge, 0])[1] += 1
+
+    def _release(self, seq):
+        held = self._held[seq]
+        held[1] -= 1
+        if held[1] == 0:
+            del self._held[seq]
+
+    def edges(self):
+        """Yield the kept edges in the order they were added."""
+        for seq in sorted(self._held):
+            yield self._held[seq][0]
+
+
+class _SpooledSparsifier(ABC):
+    """
+    Base for strategies that need a statistic over all edges before deciding.
+    Edges are spooled to a temporary NDJSON file while the statistic is
+    accumulated, then replayed through keep() once it's known.
+    """
+
+    def __init__(self, metric='composite_weight'):
+        self.metric = metric
+        self.seen = 0
+        self._spool = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+
+    def add(self, edge):
+        self.seen += 1
+        self._spool.write(json.dumps(edge, separators=(',', ':')) + '\n')
+        self.observe(edge)
+
+    @abstractmethod
+    def observe(self, edge):
+        """Accumulate the statistic from one edge."""
+
+    def prepare(self):
+        pass
+
+    @abstractmethod
+    def keep(self, edge):
+        """Whether an edge survives, once prepare() has run."""
+
+    def edges(self):
+        """Yield the kept edges in the order they were added."""
+        self.prepare()
+        self._spool.seek(0)
+        try:
+            for line in self._spool:
+                edge = json.loads(line)
+                if self.keep(edge):
+                    yield edge
+        finally:
+            self._spool.close()
+
+
+class PercentileSparsifier(_SpooledSparsifier):
+    """
+    Keep edges at or above a global percentile of one metric.
+
+    Weights are rounded to 3 decimals, so an exact histogram of distinct
+    values is small no matter how many edges there are.
+    """
+
+    def __init__(self, metric='composite_weight', percentile=90):
+        if not 0 <= percentile <= 100:
+            raise ValueError(f"percentile must be between 0 and 100, got {percentile}")
+        super().__init__(metric)
+        self.percentile = percentile
+        self.cutoff = None
+        self._histogram = {}
+
+    def observe(self, edge):
+        weight = edge[self.metric]
+        self._histogram[weight] = self._histogram.get(weight, 0) + 1
+
+    def prepare(self):
+        # Smallest weight with at least `percentile` percent of edges below or at it
+        rank = self.seen * self.percentile / 100
+        below = 0
+        self.cutoff = None
+        for weight in sorted(self._histogram):
+            below += self._histogram[weight]
+            if below >= rank:
+                self.cutoff = weight
+                break
+        print(f"{self.percentile}th percentile {self.metric} cutoff: {self.cutoff}")
+
+    def keep(self, edge):
+        return self.cutoff is not None and edge[self.metric] >= self.cutoff
+
+
+class DisparitySparsifier(_SpooledSparsifier):
+    """
+    Disparity filter backbone (Serrano, Boguna & Vespignani 2009).
+
+    For a commander with strength s (sum of its edge weights) and degree k,
+    an edge of weight w is significant if
+
+        alpha = (1 - w / s) ** (k - 1) < significance
+
+    i.e. it carries more of the commander's weight than a uniform random split
+    would. An edge is kept if it's significant for either endpoint. Commanders
+    with a single edge keep it.
+    """
+
+    def __init__(self, metric='composite_weight', significance=0.05):
+        super().__init__(metric)
+        self.significance = significance
+        self._strength = {}
+        self._degree = {}
+
+    def observe(self, edge):
+        weight = edge[self.metric]
+        if weight <= 0:
+            return
+        for commander in (edge['source'], edge['target']):
+            self._strength[commander] = self._strength.get(commander, 0) + weight
+            self._degree[commander] = self._degree.get(commander, 0) + 1
+
+    def _alpha(self, commander, weight):
+        degree = self._degree[commander]
+        if degree <= 1:
+            return 0
+        return (1 - weight / self._strength[commander]) ** (degree - 1)
+
+    def keep(self, edge):
+        weight = edge[self.metric]
+        if weight <= 0:
+            return False
+        return min(self._alpha(edge['source'], weight), self._alpha(edge['target'], weight)) < self.significance
+
+
+SPARSIFIERS = {
+    'topk': TopKSparsifier,
+    'percentile': PercentileSparsifier,
+    'disparity': DisparitySparsifier
+}
+
+
+def create_sparsifier(mode, metric='composite_weight', **params):
+    """
+    Build a sparsifier by name. Extra params go to the strategy:
+    - topk: k
+    - percentile: percentile
+    - disparity: significance
+    """
+    if metric not in WEIGHT_METRICS:
+        raise ValueError(f"Unknown weight metric: {metric}")
+    return SPARSIFIERS[mode](metric, **params)
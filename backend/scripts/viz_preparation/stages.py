@@ -0,0 +1,111 @@
+import sys
+
+# Fields each pipeline stage reads:
+# - commander: top-level keys of a commander's data. card_counts is derived:
+#   when card_groups itself isn't kept, the projection keeps each group's size
+# - card: keys of each card entry in card_groups
+# - metadata: keys of each card_metadata entry
+STAGE_FIELDS = {
+    'nodes': {
+        'commander': {'deck_count', 'rank', 'color_identity', 'tribes', 'card_counts'},
+        'card': set(),
+        'metadata': {'released_at', 'image_uris', 'edhrec_rank', 'type_line'}
+    },
+    'overlap': {
+        'commander': {'color_identity', 'card_groups'},
+        'card': {'name'},
+        'metadata': {'color_identity'}
+    },
+    'uniqueness': {
+        'commander': {'card_groups'},
+        'card': {'name'},
+        'metadata': set()
+    },
+    'tribes': {
+        'commander': {'tribes'},
+        'card': set(),
+        'metadata': set()
+    }
+}
+
+PIPELINE_STAGES = list(STAGE_FIELDS)
+EDGE_STAGES = ['overlap', 'uniqueness', 'tribes']
+
+# Entries measured for a projection's size report (see project_entries)
+SIZE_SAMPLE = 100
+
+
+def fields_for_stages(stages):
+    """Union of the fields the given stages read, per kind (commander, card, metadata)."""
+    fields = {'commander': set(), 'card': set(), 'metadata': set()}
+    for stage in stages:
+        if stage not in STAGE_FIELDS:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        for kind, names in STAGE_FIELDS[stage].items():
+            fields[kind] |= names
+    return fields
+
+
+def project_commander(data, commander_fields, card_fields):
+    """Copy of one commander's data with only the given fields (and card fields in card_groups)."""
+    if not data:
+        return data
+    projected = {key: value for key, value in data.items() if key in commander_fields}
+    if 'card_counts' in commander_fields and 'card_groups' in data and 'card_groups' not in projected:
+        projected['card_counts'] = {group: len(cards) for group, cards in (data.get('card_groups') or {}).items()}
+    if 'card_groups' in projected:
+        projected['card_groups'] = {
+            group: [{key: value for key, value in card.items() if key in card_fields} for card in cards]
+            for group, cards in (projected['card_groups'] or {}).items()
+        }
+    return projected
+
+
+def project_metadata(card, metadata_fields):
+    return {key: value for key, value in card.items() if key in metadata_fields}
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Approximate memory held by nested dicts, lists and scalars. Objects
+    shared between entries (interned strings, small ints) count once.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def report_projection(label, full_size, projected_size, estimated=False):
+    saved = full_size - projected_size
+    about = "about " if estimated else ""
+    print(f"{label}: kept {about}{projected_size / 1e6:.1f} MB of {full_size / 1e6:.1f} MB "
+          f"(saved {saved / 1e6:.1f} MB, {saved / full_size:.0%})" if full_size else f"{label}: nothing loaded")
+
+
+def project_entries(entries, project, label, sample_size=SIZE_SAMPLE):
+    """
+    Replace each value of the dict entries with project(value), in place, and
+    report how much memory that saved. Sizes are only measured on about
+    sample_size evenly spaced entries and scaled up, so the report doesn't
+    cost another walk over all of the data.
+    """
+    step = max(1, len(entries) // sample_size)
+    full_size = projected_size = sampled = 0
+    for k, (key, value) in enumerate(entries.items()):
+        projected = project(value)
+        if k % step == 0:
+            full_size += deep_sizeof(value)
+            projected_size += deep_sizeof(projected)
+            sampled += 1
+        entries[key] = projected
+    scale = len(entries) / sampled if sampled else 0
+    report_projection(label, full_size * scale, projected_size * scale, estimated=step > 1)
+    return entries
@@ -18,16 +18,57 @@ DEBUG_PAIRS = [
     ("Atraxa, Praetors' Voice", "Vorinclex, Monstrous Raider")  # Superfriends/counters commanders
 ]
 
+# Format staples that show up in most decks of their colors. Pairs whose only
+# shared cards are on this list can be skipped with skip_staple_pairs.
+STAPLE_CARDS = [
+    "Sol Ring",
+    "Arcane Signet",
+    "Command Tower",
+    "Exotic Orchard",
+    "Path of Ancestry",
+    "Reliquary Tower",
+    "Mind Stone",
+    "Fellwar Stone",
+    "Commander's Sphere",
+    "Thought Vessel",
+    "Swiftfoot Boots",
+    "Lightning Greaves"
+]
+
 def get_cards_from_category(commander_data, commander, category):
     """
     Helper function to safely get cards from a category for a commander.
     Handles missing data gracefully.
     """
-    if not commander_data.get(commander, {}).get('card_groups', {}):
-        return []
-    # Extract just the card names from the card dictionaries
-    cards = commander_data[commander]['card_groups'].get(category, [])
-    return [card['name'] for card in cards]  # Changed this line to extract card names
+    return commander_data.card_names_in(commander, category)
+
+def get_card_ids_from_category(commander_data, commander, category):
+    """
+    Like get_cards_from_category, but returns the cheapest card keys available:
+    the sorted integer ID array from a CommanderStore, or card names otherwise.
+    Look up frequencies for these keys with get_card_key_frequencies.
+    """
+    return commander_data.card_ids(commander, category)
+
+def get_commander_record(commander_data, commander):
+    """
+    A commander's data for stages that don't need card lists. Sharded data
+    answers from its index, without deserializing card_groups.
+    """
+    return commander_data.node_record(commander)
+
+def get_card_counts(commander_data, commander):
+    """Number of cards in each of CARD_CATEGORIES, without reading card lists where possible."""
+    counts = commander_data.card_counts(commander)
+    return {category: counts.get(category, 0) for category in CARD_CATEGORIES}
+
+def get_referenced_card_names(commander_data):
+    """Every card name in any commander's card groups, plus the commanders themselves."""
+    return commander_data.referenced_card_names()
+
+def get_card_key_frequencies(commander_data, card_frequencies):
+    """Card frequencies keyed the same way as get_card_ids_from_category's results."""
+    return commander_data.frequencies_by_id(card_frequencies)
 
 
 def print_example_frequencies(card_frequencies):
@@ -38,16 +79,33 @@ def print_example_frequencies(card_frequencies):
         freq = card_frequencies.get(card, 0)
         print(f"{card}: Used in {freq*100:.1f}% of all commanders")
 
+def count_tribe_weights(edges, histogram):
+    """
+    Pass edges through unchanged while counting positive tribes_weight values
+    into histogram (a Counter). Weights are rounded to 3 decimals, so the
+    histogram stays small however many edges stream past.
+    """
+    for edge in edges:
+        weight = edge['tribes_weight']
+        if weight > 0:
+            histogram[weight] += 1
+        yield edge
+
 def print_tribe_distribution(tribe_weights):
-    """Helper function to print tribal weight distribution for debugging"""
+    """
+    Helper function to print tribal weight distribution for debugging.
+    Takes a weight -> count histogram (see count_tribe_weights).
+    """
     if tribe_weights:
         print("\nTribal Weight Distribution:")
+        def count_between(low, high):
+            return sum(count for w, count in tribe_weights.items() if low < w <= high)
         weight_distribution = {
-            "0.0-0.2": len([w for w in tribe_weights if w <= 0.2]),
-            "0.2-0.4": len([w for w in tribe_weights if 0.2 < w <= 0.4]),
-            "0.4-0.6": len([w for w in tribe_weights if 0.4 < w <= 0.6]),
-            "0.6-0.8": len([w for w in tribe_weights if 0.6 < w <= 0.8]),
-            "0.8-1.0": len([w for w in tribe_weights if w > 0.8])
+            "0.0-0.2": sum(count for w, count in tribe_weights.items() if w <= 0.2),
+            "0.2-0.4": count_between(0.2, 0.4),
+            "0.4-0.6": count_between(0.4, 0.6),
+            "0.6-0.8": count_between(0.6, 0.8),
+            "0.8-1.0": sum(count for w, count in tribe_weights.items() if w > 0.8)
         }
         print("Weight distribution:", weight_distribution)
         print(f"Min weight: {min(tribe_weights):.3f}")
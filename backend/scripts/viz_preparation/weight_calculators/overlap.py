@@ -1,8 +1,73 @@
+import numpy as np
+
+from ..utils import CARD_CATEGORIES, get_cards_from_category, get_commander_record
+
+# WUBRG color identity packed into 5 bits
+COLOR_BITS = {'W': 1, 'U': 2, 'B': 4, 'R': 8, 'G': 16}
+NUM_COLOR_SUBSETS = 32
+
 def get_commander_colors(commander_data, commander_name):
     """Get color identity for a commander from the extracted data"""
-    return set(commander_data.get(commander_name, {}).get('color_identity', []))
+    data = get_commander_record(commander_data, commander_name) if commander_name in commander_data else None
+    return set((data or {}).get('color_identity', []))
+
+def color_identity_mask(colors):
+    """Encode a color identity list like ['G', 'W'] as a WUBRG bitmask (G|W = 17)."""
+    mask = 0
+    for color in colors:
+        mask |= COLOR_BITS.get(color, 0)
+    return mask
+
+def encode_card_color_masks(card_metadata, cards=None):
+    """
+    Encode each card's color identity once as a bitmask.
+    Cards missing from card_metadata count as colorless (mask 0), same as before.
+    """
+    if cards is None:
+        cards = card_metadata.keys()
+    return {card: color_identity_mask(card_metadata.get(card, {}).get('color_identity', [])) for card in cards}
 
-def calculate_normalized_overlap(cmd1, cmd2, cards1, cards2, commander_data, card_metadata):
+def build_color_fit_table(cards, card_masks):
+    """
+    Count how many of a commander's cards fit inside each of the 32 color subsets.
+
+    table[s] = number of cards whose color identity is a subset of s.
+    table[0] is the colorless count, table[31] is every card.
+
+    Built from a histogram of card masks followed by a subset-sum over the 5 bits.
+    """
+    masks = np.fromiter((card_masks.get(c, 0) for c in cards), dtype=np.int64, count=len(cards))
+    table = np.bincount(masks, minlength=NUM_COLOR_SUBSETS)
+    subsets = np.arange(NUM_COLOR_SUBSETS)
+    for bit in COLOR_BITS.values():
+        with_bit = subsets[(subsets & bit) != 0]
+        table[with_bit] += table[with_bit ^ bit]
+    return table
+
+def build_color_fit_tables(commander_data, commanders, card_metadata):
+    """
+    Precompute color fit tables for every commander and category.
+
+    Returns:
+    - commander_masks: (n,) array of commander color identity masks
+    - fit_tables: category -> (n, 32) array of build_color_fit_table rows
+    """
+    card_masks = {}
+    fit_tables = {}
+    for category in CARD_CATEGORIES:
+        table = np.zeros((len(commanders), NUM_COLOR_SUBSETS), dtype=np.int64)
+        for row, commander in enumerate(commanders):
+            cards = get_cards_from_category(commander_data, commander, category)
+            card_masks.update(encode_card_color_masks(card_metadata, [c for c in cards if c not in card_masks]))
+            table[row] = build_color_fit_table(cards, card_masks)
+        fit_tables[category] = table
+
+    commander_masks = np.array(
+        [color_identity_mask(get_commander_colors(commander_data, c)) for c in commanders], dtype=np.int64
+    )
+    return commander_masks, fit_tables
+
+def calculate_normalized_overlap(cmd1, cmd2, cards1, cards2, commander_data, card_metadata, fit_tables=None):
     """
     Calculate overlap between commanders normalized by their shared colors.
     
@@ -18,14 +83,21 @@ def calculate_normalized_overlap(cmd1, cmd2, cards1, cards2, commander_data, car
     Example:
     - If two commanders share only red, we mainly consider red cards
     - This prevents artificial high overlap just because both use generic staples
+
+    fit_tables: optional (table1, table2) from build_color_fit_table for this
+    category. When given, the possible overlap is two table lookups instead of
+    a scan over both card lists.
     """
     colors1 = get_commander_colors(commander_data, cmd1)
     colors2 = get_commander_colors(commander_data, cmd2)
     shared_colors = colors1.intersection(colors2)
     
     overlap = len(set(cards1).intersection(cards2))
-    
-    if not shared_colors:
+
+    if fit_tables is not None:
+        shared_mask = color_identity_mask(shared_colors)
+        possible_overlap = min(fit_tables[0][shared_mask], fit_tables[1][shared_mask])
+    elif not shared_colors:
         # If no shared colors, only consider colorless cards
         colorless_cards1 = [c for c in cards1 if not card_metadata.get(c, {}).get('color_identity', [])]
         colorless_cards2 = [c for c in cards2 if not card_metadata.get(c, {}).get('color_identity', [])]
@@ -38,6 +110,26 @@ def calculate_normalized_overlap(cmd1, cmd2, cards1, cards2, commander_data, car
     
     return overlap / possible_overlap if possible_overlap > 0 else 0
 
+def calculate_normalized_overlap_matrix(overlap, fit_tables, commander_masks, rows=None):
+    """
+    Vectorized calculate_normalized_overlap for many pairs at once (one category).
+
+    overlap:         (len(rows), n) array of raw shared-card counts
+    fit_tables:      (n, 32) array, one build_color_fit_table row per commander
+    commander_masks: (n,) array of commander color identity masks
+    rows:            commander indices for the rows of overlap (default: all)
+
+    Returns the normalized overlap for every (row, column) pair.
+    """
+    if rows is None:
+        rows = np.arange(overlap.shape[0])
+    cols = np.arange(overlap.shape[1])
+    shared = commander_masks[rows][:, None] & commander_masks[None, :]
+    possible = np.minimum(fit_tables[rows[:, None], shared], fit_tables[cols[None, :], shared])
+    normalized = np.zeros(overlap.shape, dtype=np.float64)
+    np.divide(overlap, possible, out=normalized, where=possible > 0)
+    return normalized
+
 def normalize_raw_weight(raw_weight, max_possible_overlap):
     """
     Convert raw card overlap count to a ratio (0 to 1).
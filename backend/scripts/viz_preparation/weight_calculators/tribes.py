@@ -1,3 +1,12 @@
+import numpy as np
+from scipy import sparse
+
+from ..utils import get_commander_record
+
+# Defaults used by the edge engines for tribes_simplified_weight
+SIMPLIFIED_TOP_N = 3
+SIMPLIFIED_POSITION_DECAY = 0.85
+
 def normalize_tribe_counts(commander_data, debug=False):
     """
     Normalize tribe counts for each commander by their total tribal decks count.
@@ -16,7 +25,8 @@ def normalize_tribe_counts(commander_data, debug=False):
     """
     normalized_tribes = {}
     
-    for commander, data in commander_data.items():
+    for commander in commander_data:
+        data = get_commander_record(commander_data, commander)
         if not data or 'tribes' not in data:
             continue
             
@@ -146,4 +156,111 @@ def calculate_tribes_simplified_weight(cmd1, cmd2, normalized_tribes, top_n=5, p
         print(f"Max possible score: {max_possible_score:.3f}")
         print(f"Final normalized score: {final_score:.3f}")
     
-    return final_score
\ No newline at end of file
+    return final_score
+
+def build_tribe_weight_matrix(normalized_tribes, commanders):
+    """
+    Dense commander x tribe matrix of normalized tribe weights (0 where a
+    commander doesn't have the tribe). Returns (tribe_index, weights).
+    """
+    tribe_index = {}
+    for commander in commanders:
+        for tribe in normalized_tribes.get(commander, {}):
+            tribe_index.setdefault(tribe, len(tribe_index))
+
+    weights = np.zeros((len(commanders), len(tribe_index)))
+    for row, commander in enumerate(commanders):
+        for tribe, weight in normalized_tribes.get(commander, {}).items():
+            weights[row, tribe_index[tribe]] = weight
+    return tribe_index, weights
+
+def build_tribe_rank_matrix(normalized_tribes, commanders, top_n=5):
+    """
+    Rank each commander's tribes once: a sparse commander x tribe matrix with
+    position + 1 (1 = primary tribe) for the top_n tribes, and nothing else.
+    Ties are ordered the same way as calculate_tribes_simplified_weight.
+    Returns (tribe_index, ranks).
+    """
+    tribe_index = {}
+    rows, cols, data = [], [], []
+    for row, commander in enumerate(commanders):
+        tribes = normalized_tribes.get(commander, {})
+        top_tribes = sorted(tribes.items(), key=lambda x: x[1], reverse=True)[:top_n]
+        for position, (tribe, _) in enumerate(top_tribes):
+            rows.append(row)
+            cols.append(tribe_index.setdefault(tribe, len(tribe_index)))
+            data.append(position + 1)
+    ranks = sparse.csr_matrix((data, (rows, cols)), shape=(len(commanders), len(tribe_index)), dtype=np.int64)
+    return tribe_index, ranks
+
+def calculate_tribes_weight_matrix(weights, rows=None, chunk_size=None):
+    """
+    Vectorized calculate_tribes_weight: for each pair, the strongest shared
+    tribe, where a tribe counts with the smaller of the two weights.
+
+    weights: (n, tribes) matrix from build_tribe_weight_matrix. Missing tribes
+    are 0, so min() drops them without a separate shared-tribe check.
+    Returns a dense (len(rows), n) array.
+    """
+    block = weights[rows] if rows is not None else weights
+    result = np.zeros((block.shape[0], weights.shape[0]))
+    if weights.shape[1] == 0:
+        return result
+    # Keep the (chunk, n, tribes) broadcast around 32 MB
+    if chunk_size is None:
+        chunk_size = max(1, 4_000_000 // max(1, weights.shape[0] * weights.shape[1]))
+    for start in range(0, block.shape[0], chunk_size):
+        chunk = block[start:start + chunk_size]
+        result[start:start + chunk_size] = np.minimum(chunk[:, None, :], weights[None, :, :]).max(axis=2)
+    return result
+
+def calculate_tribes_simplified_weight_matrix(ranks, position_decay=0.9, top_n=5, rows=None):
+    """
+    Vectorized calculate_tribes_simplified_weight for every pair.
+
+    With P holding each ranked tribe's position weight (decay ** position) and
+    M marking ranked tribes, a shared tribe contributes (P_i + P_j) / 2, so
+    the pair scores are (P M.T + M P.T) / 2, normalized by the best possible
+    score sum(decay ** k for k < top_n).
+
+    ranks: from build_tribe_rank_matrix with the same top_n. Changing
+    position_decay only rescales P, so a sweep reuses the same ranks.
+    Returns a dense (len(rows), n) array.
+    """
+    max_possible_score = sum(position_decay ** i for i in range(top_n))
+    marks = ranks.copy()
+    marks.data = np.ones_like(marks.data, dtype=np.float64)
+    positions = ranks.copy().astype(np.float64)
+    positions.data = position_decay ** (ranks.data - 1).astype(np.float64)
+
+    block_marks = marks[rows] if rows is not None else marks
+    block_positions = positions[rows] if rows is not None else positions
+    total_score = ((block_positions @ marks.T) + (block_marks @ positions.T)).toarray() / 2
+    if max_possible_score > 0:
+        total_score /= max_possible_score
+    return total_score
+
+def calculate_tribe_weight_matrices(normalized_tribes, commanders, top_n=SIMPLIFIED_TOP_N,
+                                    position_decay=SIMPLIFIED_POSITION_DECAY):
+    """
+    Both tribe weights for every pair in one pass.
+    Returns (tribes_weight, tribes_simplified_weight), each a dense (n, n) array.
+    """
+    _, weights = build_tribe_weight_matrix(normalized_tribes, commanders)
+    _, ranks = build_tribe_rank_matrix(normalized_tribes, commanders, top_n)
+    return (
+        calculate_tribes_weight_matrix(weights),
+        calculate_tribes_simplified_weight_matrix(ranks, position_decay, top_n)
+    )
+
+def sweep_position_decay(normalized_tribes, commanders, position_decays, top_n=SIMPLIFIED_TOP_N):
+    """
+    tribes_simplified_weight for all pairs at each decay in a grid. Tribes are
+    ranked once; each decay is a couple of sparse products.
+    Returns {position_decay: dense (n, n) array}.
+    """
+    _, ranks = build_tribe_rank_matrix(normalized_tribes, commanders, top_n)
+    return {
+        decay: calculate_tribes_simplified_weight_matrix(ranks, decay, top_n)
+        for decay in position_decays
+    }
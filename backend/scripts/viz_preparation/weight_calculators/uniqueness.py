@@ -1,4 +1,10 @@
-from ..utils import CARD_CATEGORIES, get_cards_from_category
+import math
+
+import numpy as np
+from scipy import sparse
+
+from ..incidence import build_incidence_matrices
+from ..utils import CARD_CATEGORIES, get_card_key_frequencies
 
 
 def calculate_card_frequencies(commander_data): 
@@ -9,19 +15,17 @@ def calculate_card_frequencies(commander_data):
     - Sol Ring appears in 160/200 commanders -> frequency 0.8 -> uniqueness 0.2
     - Niche tribal card in 10/200 commanders -> frequency 0.05 -> uniqueness 0.95
     """
-    card_frequencies = {}
     total_commanders = len(commander_data)
-    
-    # Count how many commanders use each card
-    for commander, data in commander_data.items():
-        if data and 'card_groups' in data:
-            for category in CARD_CATEGORIES:
-                cards = get_cards_from_category(commander_data, commander, category)
-                for card in cards:
-                    card_frequencies[card] = card_frequencies.get(card, 0) + 1
-    
+
+    # Count how many commanders use each card by card key, then translate back to names once
+    counts = {}
+    for commander in commander_data:
+        for category in CARD_CATEGORIES:
+            for card in commander_data.card_ids(commander, category):
+                counts[card] = counts.get(card, 0) + 1
+
     # Convert to frequency ratio (0 to 1)
-    return {card: count/total_commanders for card, count in card_frequencies.items()}
+    return {commander_data.card_name(card): count / total_commanders for card, count in counts.items()}
 
 def calculate_uniqueness_weight(cards1, cards2, card_frequencies, debug=False):
     """
@@ -40,11 +44,57 @@ def calculate_uniqueness_weight(cards1, cards2, card_frequencies, debug=False):
             freq = card_frequencies.get(card, 0)
             print(f"  {card}: Used in {freq*100:.1f}% of commanders")
     
-    # Average uniqueness of shared cards
+    # Average uniqueness of shared cards. fsum is exact, so the result doesn't
+    # depend on set iteration order (which changes with the hash seed)
     uniqueness_scores = [1 - card_frequencies.get(card, 0) for card in shared_cards]
-    avg_uniqueness = sum(uniqueness_scores) / len(uniqueness_scores)
+    avg_uniqueness = math.fsum(uniqueness_scores) / len(uniqueness_scores)
     
     if debug:
         print(f"Average uniqueness score: {avg_uniqueness:.3f}")
     
-    return avg_uniqueness
\ No newline at end of file
+    return avg_uniqueness
+
+def build_uniqueness_weights(card_index, card_frequencies):
+    """(1 - frequency) per incidence matrix column, keyed like card_index."""
+    weights = np.zeros(len(card_index))
+    for card, col in card_index.items():
+        weights[col] = 1 - card_frequencies.get(card, 0)
+    return weights
+
+def calculate_uniqueness_matrix(incidence, uniqueness_weights, rows=None, overlap=None):
+    """
+    Batch version of calculate_uniqueness_weight for every pair in one category.
+
+    With A the commander x card incidence matrix and W = diag(1 - frequency),
+    the sum of uniqueness over shared cards is (A W A.T) and the number of
+    shared cards is (A A.T), so
+
+        uniqueness[i, j] = (A W A.T)[i, j] / (A A.T)[i, j]
+
+    and 0 where nothing is shared, same as the scalar function.
+
+    rows:    optional slice or index array of A's rows to compute (a block)
+    overlap: optional precomputed dense (A A.T)[rows], to skip that product
+
+    Returns a dense (len(rows), n) array.
+    """
+    block = incidence[rows] if rows is not None else incidence
+    if overlap is None:
+        overlap = (block @ incidence.T).toarray()
+    shared_uniqueness = (block @ sparse.diags(uniqueness_weights) @ incidence.T).toarray()
+    uniqueness = np.zeros(overlap.shape, dtype=np.float64)
+    np.divide(shared_uniqueness, overlap, out=uniqueness, where=overlap > 0)
+    return uniqueness
+
+def calculate_uniqueness_matrices(commander_data, commanders, card_frequencies):
+    """
+    Full per-category uniqueness matrices for all pairs of commanders.
+    Returns category -> dense (n, n) array, matching calculate_uniqueness_weight
+    for every pair.
+    """
+    card_index, matrices, _ = build_incidence_matrices(commander_data, commanders)
+    weights = build_uniqueness_weights(card_index, get_card_key_frequencies(commander_data, card_frequencies))
+    return {
+        category: calculate_uniqueness_matrix(matrices[category], weights)
+        for category in CARD_CATEGORIES
+    }
@@ -0,0 +1,21 @@
+// Copies the pipeline's graph bundle into public/ so the app can fetch it.
+// Runs before `npm run dev` and `npm run build`; a missing bundle is only a
+// warning, so the app still builds before the pipeline has been run.
+import { copyFileSync, existsSync, mkdirSync } from 'node:fs';
+import { dirname, resolve } from 'node:path';
+import { fileURLToPath } from 'node:url';
+
+const root = resolve(dirname(fileURLToPath(import.meta.url)), '..');
+const source = resolve(root, process.env.GRAPH_BUNDLE ?? '../backend/scripts/viz_data/graph.bin');
+const target = resolve(root, 'public/graph.bin');
+
+if (existsSync(source)) {
+  mkdirSync(dirname(target), { recursive: true });
+  copyFileSync(source, target);
+  console.log(`Copied ${source} to public/graph.bin`);
+} else if (existsSync(target)) {
+  console.warn(`No graph bundle at ${source}, keeping the existing public/graph.bin`);
+} else {
+  console.warn(`No graph bundle at ${source}; run backend/scripts/viz_preparation first ` +
+               '(the app will show an empty graph until then)');
+}
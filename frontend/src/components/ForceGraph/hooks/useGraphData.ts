@@ -1,11 +1,12 @@
 import { useState, useEffect } from 'react';
 import type { GraphData } from '../types/config';
-import type { GraphNode } from '../types/nodes';
-import type { GraphLink } from '../types/links';
+import { decodeGraphBundle } from '../utils/graphBundle';
 
-// Import JSON directly
-const nodesData = await import('../data/nodes.json', { assert: { type: 'json' } });
-const edgesData = await import('../data/edges.json', { assert: { type: 'json' } });
+// Columnar bundle from viz_preparation (viz_data/graph.bin), fetched as binary
+// instead of parsing nodes.json and edges.json into the JS bundle. It's copied
+// into public/ by `npm run copy-graph-data` (run before dev and build), so it
+// isn't part of the source tree and a build never depends on it
+const graphBundleUrl = `${import.meta.env.BASE_URL}graph.bin`;
 
 export const useGraphData = () => {
     const [graphData, setGraphData] = useState<GraphData>({
@@ -14,40 +15,32 @@ export const useGraphData = () => {
     });
 
   useEffect(() => {
-    try {
-      // Access the default export from the JSON modules
-      const nodes = nodesData.default;
-      const edges = edgesData.default;
-
-      console.log('Imported nodes:', nodes);
-      console.log('Imported edges:', edges);
-
-      if (!nodes || !edges) {
-        console.error('Failed to load data:', { nodes, edges });
-        return;
+    let cancelled = false;
+
+    const loadGraph = async () => {
+      try {
+        const response = await fetch(graphBundleUrl);
+        if (!response.ok) {
+          console.error('Failed to load graph bundle:', response.status);
+          return;
+        }
+
+        const formattedData = decodeGraphBundle(await response.arrayBuffer());
+        console.log(`Loaded ${formattedData.nodes.length} nodes and ${formattedData.links.length} links`);
+
+        if (!cancelled) {
+          setGraphData(formattedData);
+        }
+      } catch (error) {
+        console.error('Error in useGraphData:', error);
       }
+    };
 
-      // Ensure proper typing of the data
-      const formattedNodes = Object.values(nodes) as GraphNode[];
-      const formattedEdges = Object.values(edges) as GraphLink[];
-
-      // Create properly typed GraphData object
-      const formattedData: GraphData = {
-        nodes: formattedNodes,
-        links: formattedEdges.map(edge => ({
-          ...edge,
-          // Ensure source and target are strings
-          source: typeof edge.source === 'object' ? edge.source.id : edge.source,
-          target: typeof edge.target === 'object' ? edge.target.id : edge.target
-        }))
-      };
-
-      console.log('Setting formatted data:', formattedData);
-      setGraphData(formattedData);
-    } catch (error) {
-      console.error('Error in useGraphData:', error);
-    }
+    loadGraph();
+    return () => {
+      cancelled = true;
+    };
   }, []);
 
   return graphData;
-};
\ No newline at end of file
+};
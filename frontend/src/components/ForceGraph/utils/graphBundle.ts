@@ -0,0 +1,76 @@
+import type { GraphData } from '../types/config';
+import type { GraphNode } from '../types/nodes';
+import type { GraphLink } from '../types/links';
+
+/**
+ * Decoder for the columnar graph bundle written by
+ * backend/scripts/viz_preparation/graph_bundle.py
+ */
+
+const BUNDLE_MAGIC = 'CGB1';
+const BUNDLE_VERSION = 1;
+
+interface BundleSection {
+  offset: number;
+  length: number;
+  dtype?: 'uint16' | 'uint32';
+  encoding?: 'json';
+}
+
+interface BundleHeader {
+  version: number;
+  node_count: number;
+  edge_count: number;
+  weight_scale: number;
+  metrics: string[];
+  sections: Record<string, BundleSection>;
+}
+
+/**
+ * Decodes a bundle into the same shape as nodes.json / edges.json.
+ * Index and weight columns are read as typed-array views over the buffer, without copying.
+ */
+export const decodeGraphBundle = (buffer: ArrayBuffer): GraphData => {
+  const bytes = new Uint8Array(buffer);
+  const decoder = new TextDecoder();
+  if (decoder.decode(bytes.subarray(0, 4)) !== BUNDLE_MAGIC) {
+    throw new Error('Not a graph bundle');
+  }
+
+  const headerLength = new DataView(buffer).getUint32(4, true);
+  const header: BundleHeader = JSON.parse(decoder.decode(bytes.subarray(8, 8 + headerLength)));
+  if (header.version !== BUNDLE_VERSION) {
+    throw new Error(`Unsupported graph bundle version ${header.version}`);
+  }
+  const body = 8 + headerLength;
+
+  const column = (name: string): Uint16Array | Uint32Array => {
+    const { offset, length, dtype } = header.sections[name];
+    return dtype === 'uint32'
+      ? new Uint32Array(buffer, body + offset, length / 4)
+      : new Uint16Array(buffer, body + offset, length / 2);
+  };
+
+  const nodeTable = header.sections.nodes;
+  const nodes: GraphNode[] = JSON.parse(
+    decoder.decode(bytes.subarray(body + nodeTable.offset, body + nodeTable.offset + nodeTable.length))
+  );
+
+  const sources = column('source');
+  const targets = column('target');
+  const weights = header.metrics.map(metric => [metric, column(`weights.${metric}`)] as const);
+
+  const links: GraphLink[] = new Array(header.edge_count);
+  for (let i = 0; i < header.edge_count; i++) {
+    const link: Record<string, string | number> = {
+      source: nodes[sources[i]].id,
+      target: nodes[targets[i]].id
+    };
+    for (const [metric, values] of weights) {
+      link[metric] = values[i] / header.weight_scale;
+    }
+    links[i] = link as unknown as GraphLink;
+  }
+
+  return { nodes, links };
+};